@@ -1,15 +1,27 @@
 import streamlit as st
 import yfinance as yf
 import pandas as pd
+import numpy as np
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 from datetime import datetime
+from bisect import bisect_right
+from collections import Counter, defaultdict
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout, wait
+from html import escape
+import functools
+import os
+import sqlite3
+import sys
+import threading
+import time
+import zlib
 import requests
 
 st.set_page_config(page_title="MarketLens", page_icon="📈", layout="wide", initial_sidebar_state="collapsed")
 
 # ── LIGHT THEME CSS ───────────────────────────────────────────────────────────
-st.markdown("""
+APP_CSS = """
 <style>
 @import url('https://fonts.googleapis.com/css2?family=Inter:wght@300;400;500;600;700&display=swap');
 html, body, [class*="css"] { font-family: 'Inter', sans-serif !important; }
@@ -85,6 +97,11 @@ hr { border-color: #e2e8f0 !important; margin: 1.2rem 0 !important; }
     text-transform: uppercase; letter-spacing: 0.1em;
     padding-bottom: 0.5rem; border-bottom: 1px solid #e2e8f0; margin-bottom: 1rem;
 }
+.as-of {
+    float: right; color: #94a3b8; font-size: 0.68rem; font-weight: 500;
+    text-transform: none; letter-spacing: 0;
+}
+.as-of.stale { color: #d97706; }
 
 /* App header */
 .app-header {
@@ -163,8 +180,17 @@ hr { border-color: #e2e8f0 !important; margin: 1.2rem 0 !important; }
     font-weight: 600; margin-bottom: 0.4rem; text-transform: uppercase; letter-spacing: 0.04em;
 }
 .kalshi-filter-bar { display: flex; gap: 0.5rem; flex-wrap: wrap; margin-bottom: 1rem; }
+.kalshi-dist { display: flex; align-items: flex-end; gap: 1px; height: 34px; margin-bottom: 0.5rem; }
+.kalshi-dist div { flex: 1; background: #93c5fd; border-radius: 2px 2px 0 0; min-height: 1px; }
+.kalshi-dist div.mid { background: #2563eb; }
+.kalshi-stats { display: flex; gap: 1.2rem; color: #475569; font-size: 0.8rem; margin-bottom: 0.4rem; }
+.kalshi-stats b { color: #0f172a; }
+.kalshi-card details summary { color: #2563eb; font-size: 0.75rem; cursor: pointer; margin-top: 0.5rem; }
+.kalshi-card details .vol-table { font-size: 0.76rem; margin-top: 0.3rem; }
+.kalshi-card details .vol-table td { padding: 0.3rem 0.5rem; }
 </style>
-""", unsafe_allow_html=True)
+"""
+st.markdown(APP_CSS, unsafe_allow_html=True)
 
 # ── SESSION STATE ─────────────────────────────────────────────────────────────
 if "selected_ticker" not in st.session_state:
@@ -177,6 +203,204 @@ SUGGESTED = ["AAPL", "MSFT", "NVDA", "TSLA", "AMZN", "META", "GOOGL", "AMD", "NF
 VOLUME_WATCH = ["AAPL", "MSFT", "NVDA", "TSLA", "AMZN", "META", "GOOGL", "AMD", "NFLX",
                 "JPM", "BAC", "XOM", "PLTR", "SPY", "QQQ", "INTC", "F", "DIS", "SOFI", "UBER"]
 
+# Event study: abnormal return = stock log return − benchmark log return,
+# summed over each window of trading days relative to the report (day 0).
+EVENT_BENCHMARK = "^GSPC"
+EVENT_HISTORY   = "10y"
+EVENT_LOOKBACK  = 40
+EVENT_WINDOWS   = {"CAR −1..+1": (-1, 1), "CAR +1..+20": (1, 20)}
+# Universe for the cross-ticker study: roughly the S&P 100 plus the app's own
+# watch lists (~100 tickers, ~4,000 reported quarters). Override with a
+# comma-separated MARKETLENS_EVENT_UNIVERSE.
+SP100 = """AAPL ABBV ABT ACN ADBE AIG AMD AMGN AMT AMZN AVGO AXP BA BAC BK BKNG BLK BMY C CAT CHTR CL CMCSA
+COF COP COST CRM CSCO CVS CVX DE DHR DIS DUK EMR F FDX GD GE GILD GM GOOGL GS HD HON IBM INTC INTU JNJ JPM
+KHC KO LIN LLY LMT LOW MA MCD MDLZ MDT MET META MMM MO MRK MS MSFT NEE NFLX NKE NVDA ORCL PEP PFE PG PM PYPL
+QCOM RTX SBUX SCHW SO SPG T TGT TMO TMUS TSLA TXN UNH UNP UPS USB V VZ WFC WMT XOM""".split()
+EVENT_UNIVERSE  = sorted(
+    s.strip().upper() for s in os.environ["MARKETLENS_EVENT_UNIVERSE"].split(",") if s.strip()
+) if os.environ.get("MARKETLENS_EVENT_UNIVERSE") else sorted(set(SP100 + SUGGESTED + VOLUME_WATCH) - {"SPY", "QQQ"})
+
+GRID_PAGE_COLS = 8   # statement periods formatted and sent per grid page
+
+# Price chart range presets: label -> (yfinance period, bar interval)
+PRICE_RANGES = {
+    "1D": ("1d", "1m"), "5D": ("5d", "5m"), "1M": ("1mo", "30m"), "6M": ("6mo", "1d"),
+    "YTD": ("ytd", "1d"), "1Y": ("1y", "1d"), "5Y": ("5y", "1d"), "Max": ("max", "1d"),
+}
+INTRADAY_RANGES = {"1D", "5D", "1M"}
+CHART_POINTS = 600   # max points per series sent to the browser
+
+# Static copy of the Market Dashboard for passive viewers, written by snapshot.py.
+SNAPSHOT_PATH     = os.environ.get("MARKETLENS_SNAPSHOT_PATH",
+                                   os.path.join(os.path.dirname(os.path.abspath(__file__)), "static", "dashboard.html"))
+SNAPSHOT_INTERVAL = 120   # seconds between rewrites
+LIVE_APP_URL      = os.environ.get("MARKETLENS_LIVE_URL", "http://localhost:8501/")
+
+ALERTS_DB      = os.environ.get("MARKETLENS_ALERTS_DB", "alerts.db")
+ALERT_INTERVAL = 180   # seconds between background rule refreshes
+
+# ── PROFILER ──────────────────────────────────────────────────────────────────
+# Opt-in with ?profile=1 or MARKETLENS_PROFILE=1; when off nothing below runs.
+PROFILE_INTERVAL = 0.005
+PROFILE_TOP_N    = 15
+
+def section_map(path):
+    """(line, label) of every section comment in the script, so samples taken
+    in top-level code can be attributed to the section being rendered."""
+    with open(path, encoding="utf-8") as f:
+        lines = f.read().splitlines()
+    marks, tab = [], ""
+    for i, line in enumerate(lines):
+        text = line.strip()
+        if not text.startswith("# "):
+            continue
+        prev = lines[i-1].strip() if i else ""
+        nxt  = lines[i+1].strip() if i + 1 < len(lines) else ""
+        if prev.startswith("# ══") and nxt.startswith("# ══"):
+            tab = text[2:].title()
+        elif text.startswith("# ── "):
+            marks.append((i + 1, f"{tab} · {text[5:].strip('─ ')}" if tab else text[5:].strip("─ ")))
+        elif line.startswith(" ") and not prev and not nxt.startswith("#"):
+            marks.append((i + 1, f"{tab} · {text[2:]}" if tab else text[2:]))
+    return marks
+
+class RunProfiler:
+    """Sampling profiler for one script run.
+
+    A daemon thread snapshots the script thread's stack every PROFILE_INTERVAL.
+    Frames from this file are kept (top-level code is labelled by section), and
+    each sample ends in the library call it was inside, e.g. `plotly.subplots.make_subplots`.
+    swr_cache'd functions show as `<name> [swr wait]`: the fetch itself runs on
+    the swr pool, so that is time the script spent waiting for it.
+    The thread exits on stop() or as soon as the run's module frame leaves the
+    stack, so runs ended by st.rerun() / st.stop() don't leave a sampler behind.
+    """
+    def __init__(self, interval=PROFILE_INTERVAL):
+        self.interval = interval
+        self.run_frame = sys._getframe(1)
+        self.path = self.run_frame.f_code.co_filename
+        self.sections = section_map(self.path)
+        self.section_lines = [ln for ln, _ in self.sections]
+        self.tid = threading.get_ident()
+        self.stacks = Counter()
+        self.elapsed = 0.0
+        self._done = threading.Event()
+
+    def start(self):
+        self.t0 = time.perf_counter()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._done.set()
+        self._thread.join()
+        self.elapsed = time.perf_counter() - self.t0
+
+    def _sample(self):
+        while not self._done.wait(self.interval):
+            frame = sys._current_frames().get(self.tid)
+            stack = self._fold(frame) if frame is not None else None
+            if stack is None:   # the run is over without reaching stop()
+                break
+            self.stacks[stack] += 1
+        self.run_frame = None
+
+    def _section(self, lineno):
+        i = np.searchsorted(self.section_lines, lineno, side="right") - 1
+        return self.sections[i][1] if i >= 0 else "setup"
+
+    def _fold(self, frame):
+        names, lib, inner, in_run = [], None, None, False
+        while frame is not None:
+            in_run = in_run or frame is self.run_frame
+            code = frame.f_code
+            if code.co_filename == self.path:
+                if code.co_name == "<module>":
+                    names.append(self._section(frame.f_lineno))
+                elif code.co_name == "lookup" and "name" in frame.f_locals:   # swr_cache'd function
+                    names.append(f"{frame.f_locals['name']} [swr wait]")
+                elif not (code.co_name == "wrapper" and "lookup" in frame.f_locals):
+                    names.append(code.co_name)
+            elif not names:
+                inner, lib = lib, f"{frame.f_globals.get('__name__', '?')}.{code.co_name}"
+            frame = frame.f_back
+        if not in_run:
+            return None
+        if lib and lib.endswith(".wrapped_func") and inner:   # st.* telemetry wrapper
+            lib = inner
+        names.reverse()
+        if lib:
+            names.append(lib)
+        return ";".join(names) or "idle"
+
+    def folded(self):
+        """Stacks in collapsed format (flamegraph.pl, speedscope)."""
+        return "\n".join(f"{stack} {n}" for stack, n in self.stacks.most_common())
+
+    def top(self, n=PROFILE_TOP_N):
+        total = sum(self.stacks.values())
+        ms = self.elapsed * 1000 / total if total else 0
+        self_n, total_n = Counter(), Counter()
+        for stack, count in self.stacks.items():
+            frames = stack.split(";")
+            self_n[frames[-1]] += count
+            for name in set(frames):
+                total_n[name] += count
+        rows = [{"Function / section": name, "Total ms": round(c * ms), "Self ms": round(self_n[name] * ms),
+                 "Total %": round(c / total * 100, 1)} for name, c in total_n.most_common(n)]
+        return pd.DataFrame(rows)
+
+    def flame_svg(self, width=1200, row=18):
+        root = {}
+        for stack, n in self.stacks.items():
+            node = root
+            for name in stack.split(";"):
+                entry = node.setdefault(name, [0, {}])
+                entry[0] += n
+                node = entry[1]
+        total = sum(self.stacks.values()) or 1
+        rects = []
+        def walk(children, x, depth):
+            for name, (n, kids) in sorted(children.items()):
+                w = n / total * width
+                rects.append((x, depth, w, name, n))
+                walk(kids, x, depth + 1)
+                x += w
+        walk(root, 0.0, 0)
+        height = (max((d for _, d, _, _, _ in rects), default=0) + 1) * row + 24
+        body = []
+        for x, depth, w, name, n in rects:
+            if w < 0.5:
+                continue
+            y = height - (depth + 1) * row
+            hue = 10 + zlib.crc32(name.encode()) % 45
+            chars = int((w - 6) / 6.5)
+            label = name if len(name) <= chars else (name[:chars-1] + "…" if chars > 2 else "")
+            body.append(f'<g><title>{escape(name)} — {n} samples ({n/total:.1%})</title>'
+                        f'<rect x="{x:.1f}" y="{y}" width="{w:.1f}" height="{row-1}" rx="2" fill="hsl({hue},85%,62%)"/>'
+                        f'<text x="{x+3:.1f}" y="{y+row-6}">{escape(label)}</text></g>')
+        return (f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+                f'font-family="Inter, sans-serif" font-size="11" fill="#0f172a">'
+                f'<text x="4" y="14" font-size="12" font-weight="600">MarketLens run · {self.elapsed*1000:.0f} ms · '
+                f'{total} samples</text>{"".join(body)}</svg>')
+
+def render_profile(prof):
+    with st.expander("⏱  Profile of this run", expanded=True):
+        st.caption(f"{prof.elapsed*1000:,.0f} ms wall · {sum(prof.stacks.values()):,} samples "
+                   f"every {prof.interval*1000:.0f} ms · script thread only; "
+                   f"[swr wait] is time spent waiting on the background fetch pool")
+        st.dataframe(prof.top(), use_container_width=True, hide_index=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        d1, d2 = st.columns(2)
+        d1.download_button("Flame graph (SVG)", prof.flame_svg(), file_name=f"marketlens-{stamp}.svg",
+                           mime="image/svg+xml", use_container_width=True)
+        d2.download_button("Folded stacks", prof.folded(), file_name=f"marketlens-{stamp}.folded",
+                           mime="text/plain", use_container_width=True)
+
+PROFILE = os.environ.get("MARKETLENS_PROFILE") == "1" or st.query_params.get("profile") == "1"
+profiler = RunProfiler().start() if PROFILE else None
+
 # ── HELPERS ───────────────────────────────────────────────────────────────────
 def fmt_large(n):
     if n is None: return "N/A"
@@ -205,6 +429,10 @@ def fmt_pct(n):
     except: pass
     return f"{n:.1f}%"
 
+def fmt_signed_pct(n):
+    if n is None or pd.isna(n): return "N/A"
+    return f"{n:+.2f}%"
+
 def pct_change(new, old):
     try:
         if None in (new, old) or pd.isna(new) or pd.isna(old) or old == 0:
@@ -213,11 +441,82 @@ def pct_change(new, old):
     except:
         return None
 
-def safe_fmt(df):
+# Array versions of the formatters above: one numpy pass per magnitude bucket
+# instead of one Python call per cell.
+def _fmt_buckets(values, buckets, rest, na, key=None):
+    arr = np.asarray(values, dtype=float)
+    out = np.full(arr.shape, na, dtype=object)
+    todo = ~np.isnan(arr)
+    mag = key(arr) if key else arr
+    for threshold, div, pattern in buckets:
+        hit = todo & (mag >= threshold)
+        if hit.any():
+            out[hit] = np.char.mod(pattern, arr[hit] / div)
+        todo &= ~hit
+    if todo.any():
+        out[todo] = rest(arr[todo])
+    return out
+
+def _fmt_commas(a):
+    """Vectorized f"{a:,.0f}" for |a| < 1e9."""
+    r = np.rint(a)
+    sign = np.where(np.signbit(r), "-", "")
+    r = np.abs(r).astype(np.int64)
+    m, k, u = r // 1_000_000, r // 1000 % 1000, r % 1000
+    m_part = np.where(m > 0, np.char.mod("%d,", m), "")
+    k_part = np.where(m > 0, np.char.mod("%03d,", k), np.where(k > 0, np.char.mod("%d,", k), ""))
+    u_part = np.where((m > 0) | (k > 0), np.char.mod("%03d", u), np.char.mod("%d", u))
+    return np.char.add(np.char.add(np.char.add(sign, m_part), k_part), u_part)
+
+def fmt_large_arr(values, na="N/A"):
+    return _fmt_buckets(values, [(1e12, 1e12, "$%.2fT"), (1e9, 1e9, "$%.2fB"), (1e6, 1e6, "$%.2fM")],
+                        lambda a: np.char.add("$", _fmt_commas(a)), na, key=np.abs)
+
+def fmt_vol_arr(values, na="N/A"):
+    return _fmt_buckets(values, [(1e9, 1e9, "%.1fB"), (1e6, 1e6, "%.1fM"), (1e3, 1e3, "%.1fK")],
+                        lambda a: np.char.mod("%.0f", a), na)
+
+def fmt_pct_arr(values, na="N/A"):
+    return _fmt_buckets(values, [], lambda a: np.char.mod("%.1f%%", a), na)
+
+def safe_fmt(df, cols=slice(0, 4)):
+    part = df.iloc[:, cols]
     try:
-        return df.iloc[:, :4].apply(lambda col: col.map(lambda x: fmt_large(x) if pd.notna(x) else "—"))
+        return pd.DataFrame(fmt_large_arr(part.to_numpy(), na="—"), index=part.index, columns=part.columns)
     except:
-        return df.iloc[:, :4]
+        return part
+
+def period_label(c):
+    return c.strftime("%b '%y") if hasattr(c, "strftime") else str(c)
+
+def statement_grid(df, key):
+    """Full-history statement grid. Periods load a page at a time, so only the
+    visible columns are formatted and sent; st.dataframe virtualizes the rows."""
+    pages = max(1, -(-len(df.columns) // GRID_PAGE_COLS))
+    page = 0
+    if pages > 1:
+        def page_label(p):
+            cols = df.columns[p*GRID_PAGE_COLS:(p+1)*GRID_PAGE_COLS]
+            return f"{period_label(cols[0])} – {period_label(cols[-1])}"
+        page = st.select_slider("Periods", options=range(pages), format_func=page_label, key=key)
+    cols = slice(page*GRID_PAGE_COLS, (page+1)*GRID_PAGE_COLS)
+    st.dataframe(safe_fmt(df, cols), use_container_width=True, height=min(38 + 35*len(df), 600))
+
+def volume_table_html(vol_df):
+    chg = vol_df["change"].astype(float)
+    chg_str = np.where(chg.notna(), np.char.mod("%+.1f%%", chg.fillna(0).values), "—")
+    cls = np.where(chg >= 0, "pos", "neg")
+    price = np.char.mod("$%.2f", vol_df["price"].astype(float).values)
+    vol = fmt_vol_arr(vol_df["volume"])
+    rows_html = "".join(
+        f'<tr><td>{t}</td><td>{p}</td><td class="{c}">{ch}</td><td>{v}</td></tr>'
+        for t, p, c, ch, v in zip(vol_df["ticker"], price, cls, chg_str, vol)
+    )
+    return f"""
+    <table class="vol-table">
+      <thead><tr><th>Ticker</th><th>Price</th><th>Chg %</th><th>Volume</th></tr></thead>
+      <tbody>{rows_html}</tbody>
+    </table>"""
 
 def apply_chart_style(fig, height=280):
     """Apply consistent light-theme style to any chart."""
@@ -233,8 +532,166 @@ def apply_chart_style(fig, height=280):
     fig.update_xaxes(showgrid=False, color="#94a3b8", tickfont=dict(size=10))
     fig.update_yaxes(gridcolor="#e2e8f0", color="#94a3b8", tickfont=dict(size=10))
 
+def news_card_html(item):
+    open_a  = f'<a href="{item["link"]}" target="_blank" style="text-decoration:none">' if item["link"] else ""
+    close_a = "</a>" if item["link"] else ""
+    return f"""
+    <div class="news-card">
+      {open_a}<div class="news-headline">{item['title']}</div>{close_a}
+      <div class="news-meta">
+        <span class="news-tag">{item['ticker']}</span>
+        {item['publisher']}{"  ·  " + item['time'] if item['time'] else ""}
+      </div>
+    </div>"""
+
+def kalshi_series(m):
+    et = m.get("event_ticker", "") or m.get("ticker", "")
+    return et.split("-")[0] if "-" in et else et[:6]
+
+def price_line_figure(x, y, height=280, hover="%{x|%b %d}<br><b>%{y:,.0f}</b><extra></extra>"):
+    """Filled close-price line, green or red by direction over the range."""
+    is_up = y[-1] >= y[0]
+    line_color = "#16a34a" if is_up else "#dc2626"
+    fill_rgb   = "22,163,74" if is_up else "220,38,38"
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(
+        x=x, y=y, name="Close",
+        fill="tozeroy", fillcolor=f"rgba({fill_rgb},0.07)",
+        line=dict(color=line_color, width=2),
+        hovertemplate=hover,
+    ))
+    apply_chart_style(fig, height=height)
+    fig.update_yaxes(range=[np.min(y) * 0.995, np.max(y) * 1.005])
+    return fig
+
+# ── DOWNSAMPLING ──────────────────────────────────────────────────────────────
+def lttb(y, n_out=CHART_POINTS):
+    """Largest-Triangle-Three-Buckets: indices of `n_out` points that keep the
+    visual shape of the series (peaks, troughs, first and last) instead of a
+    uniform stride. x is the bar position, so session gaps don't skew buckets."""
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if n <= n_out or n_out < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    csum = np.concatenate([[0.0], np.cumsum(y)])
+    out = np.empty(n_out, dtype=int)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        nxt = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = (hi + nxt - 1) / 2
+        avg_y = (csum[nxt] - csum[hi]) / (nxt - hi)
+        xs = np.arange(lo, hi)
+        area = np.abs((a - avg_x) * (y[lo:hi] - y[a]) - (a - xs) * (avg_y - y[a]))
+        a = lo + int(np.argmax(area))
+        out[i + 1] = a
+    return out
+
+# ── STALE-WHILE-REVALIDATE CACHE ──────────────────────────────────────────────
+# Values past their ttl are served immediately while a background refresh runs.
+# Only a cold miss waits, and never past the current tab's latency budget.
+TAB_BUDGETS = {"dashboard": 2.5, "earnings": 8.0, "kalshi": 5.0}   # seconds
+SWR_SETTLE  = 10   # max wait after the page renders for still-loading data
+SWR_POLL    = 0.2  # slice of that wait between checks for user input
+
+@st.cache_resource
+def swr_store():
+    return {"pool": ThreadPoolExecutor(max_workers=8, thread_name_prefix="swr"),
+            "lock": threading.Lock(), "entries": {}, "inflight": {}}
+
+_budget = threading.local()
+swr_pending = []   # futures this run gave up waiting on
+
+def set_latency_budget(seconds):
+    _budget.deadline = time.monotonic() + seconds
+
+def _budget_left():
+    deadline = getattr(_budget, "deadline", None)
+    return None if deadline is None else max(0.0, deadline - time.monotonic())
+
+def swr_cache(ttl, max_age=6*3600, pending=None, ok=None):
+    """Process-wide memoizer with stale-while-revalidate semantics.
+
+    Within `ttl` the cached value is returned; after it, the last good value is
+    still returned and one background refresh is started. A refresh that raises,
+    or whose result fails `ok`, keeps the old value. Entries older than `max_age`
+    are treated as missing and evicted. A miss waits for the fetch until the
+    latency budget runs out, then returns `pending`.
+    """
+    store = swr_store()
+    def deco(func):
+        name = func.__qualname__
+
+        def fetch(key, args):
+            try:
+                value = func(*args)
+                now = time.time()
+                with store["lock"]:
+                    entries = store["entries"]
+                    for k in [k for k, (_, ts) in entries.items() if k[0] == name and now - ts >= max_age]:
+                        del entries[k]
+                    if key in entries and ok is not None and not ok(value):
+                        return entries[key]   # upstream hiccup: keep serving the last good value
+                    entries[key] = (value, now)
+                    return entries[key]
+            finally:
+                with store["lock"]:
+                    store["inflight"].pop(key, None)
+
+        def refresh(key, args):
+            with store["lock"]:
+                fut = store["inflight"].get(key)
+                if fut is None and not threading.current_thread().name.startswith("swr"):
+                    fut = store["inflight"][key] = store["pool"].submit(fetch, key, args)
+            if fut is None:   # called from inside another fetch: run here, never queue behind it
+                fut = Future()
+                try:
+                    fut.set_result(fetch(key, args))
+                except Exception as e:
+                    fut.set_exception(e)
+            return fut
+
+        def lookup(*args):
+            key = (name, args)
+            hit = store["entries"].get(key)
+            if hit and time.time() - hit[1] < max_age:
+                if time.time() - hit[1] >= ttl:
+                    refresh(key, args)
+                return hit
+            fut = refresh(key, args)
+            try:
+                return fut.result(timeout=_budget_left())
+            except FutureTimeout:
+                swr_pending.append(fut)
+                return pending, None
+
+        @functools.wraps(func)
+        def wrapper(*args):
+            return lookup(*args)[0]
+
+        def prefetch(*args):
+            hit = store["entries"].get((name, args))
+            if not hit or time.time() - hit[1] >= ttl:
+                refresh((name, args), args)
+
+        wrapper.as_of = lambda *args: (store["entries"].get((name, args)) or (None, None))[1]
+        wrapper.entry = lookup   # (value, fetched at) from a single lookup
+        wrapper.prefetch = prefetch
+        wrapper.ttl = ttl
+        return wrapper
+    return deco
+
+def as_of_html(fn, *args):
+    ts = fn.as_of(*args)
+    if ts is None:
+        return ""
+    stale = " stale" if time.time() - ts > fn.ttl else ""
+    return f'<span class="as-of{stale}">as of {datetime.fromtimestamp(ts):%H:%M:%S}</span>'
+
 # ── DATA FUNCTIONS ────────────────────────────────────────────────────────────
-@st.cache_data(ttl=120)
+@swr_cache(ttl=120, pending={}, ok=lambda d: any(v["price"] is not None for v in d.values()))
 def get_indices():
     symbols = {"S&P 500": "^GSPC", "NASDAQ": "^IXIC", "DOW": "^DJI", "VIX": "^VIX"}
     out = {}
@@ -246,11 +703,11 @@ def get_indices():
             out[name] = {"price": None, "change": None}
     return out
 
-@st.cache_data(ttl=300)
+@swr_cache(ttl=300, pending=pd.DataFrame(), ok=lambda df: not df.empty)
 def get_sp500_history():
     return yf.Ticker("^GSPC").history(period="3mo")
 
-@st.cache_data(ttl=300)
+@swr_cache(ttl=300, pending=pd.DataFrame(), ok=lambda df: not df.empty)
 def get_top_volume():
     try:
         raw = yf.download(VOLUME_WATCH, period="2d", auto_adjust=True, progress=False)
@@ -275,7 +732,7 @@ def get_top_volume():
     except:
         return pd.DataFrame()
 
-@st.cache_data(ttl=600)
+@swr_cache(ttl=600, pending=[], ok=bool)
 def get_market_news():
     items, seen = [], set()
     for sym in ["AAPL", "MSFT", "NVDA", "TSLA", "AMZN", "META", "GOOGL"]:
@@ -309,7 +766,7 @@ KALSHI_SERIES = [
     "KXAI", "KXTECH", "KXELEC",
 ]
 
-@st.cache_data(ttl=180)
+@swr_cache(ttl=180, pending=([], ""), ok=lambda r: bool(r[0]))
 def get_kalshi_markets():
     all_markets = []
     last_err = ""
@@ -340,11 +797,70 @@ def search_tickers(query):
     except:
         return []
 
-@st.cache_data(ttl=300)
+@swr_cache(ttl=300, ok=lambda r: bool(r[0]))
 def load_ticker(symbol):
     t = yf.Ticker(symbol)
     return t.info, t.quarterly_financials, t.quarterly_balance_sheet, t.quarterly_cashflow, t.earnings_history
 
+@swr_cache(ttl=3600, ok=lambda r: any(not df.empty for df in r))
+def load_annual_statements(symbol):
+    t = yf.Ticker(symbol)
+    return t.financials, t.balance_sheet, t.cashflow
+
+@swr_cache(ttl=3600, ok=lambda df: not df.empty)
+def get_earnings_events(symbol):
+    """Reported earnings dates for one symbol with EPS actual, estimate and surprise %."""
+    try:
+        ed = yf.Ticker(symbol).get_earnings_dates(limit=EVENT_LOOKBACK)
+    except:
+        return pd.DataFrame()
+    if ed is None or ed.empty or "Reported EPS" not in ed.columns:
+        return pd.DataFrame()
+    ed = ed.dropna(subset=["Reported EPS"])
+    dates = ed.index.tz_localize(None) if ed.index.tz is not None else ed.index
+    est = ed["EPS Estimate"].astype(float).values
+    act = ed["Reported EPS"].astype(float).values
+    with np.errstate(divide="ignore", invalid="ignore"):
+        surprise = np.where(est != 0, (act - est) / np.abs(est) * 100, np.nan)
+    return pd.DataFrame({"symbol": symbol, "date": dates.normalize(),
+                         "eps_actual": act, "eps_estimate": est, "surprise": surprise})
+
+@swr_cache(ttl=300, pending={}, ok=lambda c: c is not None)
+def get_price_chart(symbol, range_key):
+    """Close series for one range preset, downsampled to CHART_POINTS, plus
+    the close at each earnings date inside the range. None if Yahoo has no
+    history for the range."""
+    period, interval = PRICE_RANGES[range_key]
+    try:
+        close = yf.Ticker(symbol).history(period=period, interval=interval)["Close"].dropna()
+    except:
+        return None
+    if close.empty:
+        return None
+    idx = close.index.tz_localize(None) if close.index.tz is not None else close.index
+    keep = lttb(close.values)
+    series = pd.Series(close.values[keep], index=idx[keep])
+    marks = pd.Series(dtype=float)
+    events = get_earnings_events(symbol)
+    if events is not None and not events.empty:
+        dates = events["date"][(events["date"] >= idx[0]) & (events["date"] <= idx[-1])]
+        pos = np.clip(idx.searchsorted(dates.values), 0, len(idx) - 1)
+        marks = pd.Series(close.values[pos], index=idx[pos])
+    return {"series": series, "marks": marks, "points": len(close)}
+
+@swr_cache(ttl=3600, ok=lambda df: not df.empty)
+def get_daily_closes(symbols):
+    """Wide frame of daily closes for `symbols` plus the event-study benchmark."""
+    tickers = sorted(set(symbols) | {EVENT_BENCHMARK})
+    try:
+        raw = yf.download(tickers, period=EVENT_HISTORY, auto_adjust=True, progress=False)
+        closes = raw["Close"]
+    except:
+        return pd.DataFrame()
+    if closes.index.tz is not None:
+        closes.index = closes.index.tz_localize(None)
+    return closes
+
 # ── ANALYSIS HELPERS ──────────────────────────────────────────────────────────
 def build_summary(info, income_q, earnings_hist, ticker):
     lines = []
@@ -422,6 +938,548 @@ def build_flags(info, income_q):
         except: pass
     return flags
 
+# ── EVENT STUDY ───────────────────────────────────────────────────────────────
+def event_study(closes, events, windows=EVENT_WINDOWS, benchmark=EVENT_BENCHMARK):
+    """Cumulative abnormal return (%) of every event over every window.
+
+    All events are evaluated at once: abnormal log returns are cumulated per
+    symbol, so each window is the difference of two gathered cumsum rows.
+    """
+    out = events.copy()
+    if closes.empty or events.empty or benchmark not in closes.columns:
+        for label in windows:
+            out[label] = np.nan
+        return out
+    rets = np.log(closes.astype(float)).diff()
+    ab = rets.sub(rets[benchmark], axis=0).drop(columns=benchmark)
+    vals = ab.to_numpy()
+    ok = ~np.isnan(vals)
+    zero = np.zeros((1, vals.shape[1]))
+    csum = np.vstack([zero, np.cumsum(np.where(ok, vals, 0.0), axis=0)])
+    ccnt = np.vstack([zero, np.cumsum(ok, axis=0)])
+    n = len(ab.index)
+    col = ab.columns.get_indexer(events["symbol"])
+    t0 = ab.index.searchsorted(events["date"].values)   # day 0 = first session on/after the report
+    for label, (a, b) in windows.items():
+        lo, hi = t0 + a, t0 + b + 1
+        valid = (col >= 0) & (lo >= 0) & (hi <= n)
+        lo, hi, c = np.clip(lo, 0, n), np.clip(hi, 0, n), np.clip(col, 0, None)
+        car = csum[hi, c] - csum[lo, c]
+        full = (ccnt[hi, c] - ccnt[lo, c]) == (b - a + 1)
+        out[label] = np.where(valid & full, np.expm1(car) * 100, np.nan)
+    return out
+
+def summarize_event_study(res, windows=EVENT_WINDOWS):
+    """Per-window reaction statistics, split by EPS beat vs miss."""
+    rows = []
+    surprise = res["surprise"] if "surprise" in res.columns else pd.Series(np.nan, index=res.index)
+    for label in windows:
+        car = res[label]
+        ok = car.notna() & surprise.notna()
+        c, s = car[ok], surprise[ok]
+        rows.append({
+            "Window":            label,
+            "Events":            int(ok.sum()),
+            "Avg % (beat)":      c[s >= 0].mean(),
+            "Avg % (miss)":      c[s < 0].mean(),
+            "Same direction %":  (np.sign(c) == np.sign(s)).mean() * 100 if len(c) else np.nan,
+            "Corr. w/ surprise": c.corr(s) if len(c) > 2 else np.nan,
+        })
+    return pd.DataFrame(rows).set_index("Window")
+
+def run_universe_study(symbols):
+    """Event study over every reported quarter of `symbols`.
+
+    Returns (results, fetch seconds, engine seconds); results are None while
+    inputs are still loading. Every symbol's earnings dates and the price
+    download are requested up front, so cold fetches run in parallel on the
+    swr pool instead of one Yahoo scrape after another.
+    """
+    t = time.perf_counter()
+    for s in symbols:
+        get_earnings_events.prefetch(s)
+    get_daily_closes.prefetch(tuple(symbols))
+    fetched = [get_earnings_events(s) for s in symbols]
+    closes = get_daily_closes(tuple(symbols))
+    fetch_s = time.perf_counter() - t
+    if closes is None or any(f is None for f in fetched):
+        return None, fetch_s, 0.0
+    frames = [f for f in fetched if not f.empty]
+    if not frames:
+        return pd.DataFrame(), fetch_s, 0.0
+    events = pd.concat(frames, ignore_index=True)
+    t = time.perf_counter()
+    res = event_study(closes, events)
+    return res, fetch_s, time.perf_counter() - t
+
+# ── KALSHI EVENT LADDERS ──────────────────────────────────────────────────────
+# Ranged series (KXINX, KXBTC, KXFED, ...) list one market per strike. Each
+# snapshot is grouped by event once, strikes ordered, and the implied
+# distribution built for every event in the same vectorized pass.
+LADDER_COLS = ["ticker", "event_ticker", "title", "subtitle", "strike_type", "floor_strike", "cap_strike",
+               "last_price", "volume_24h", "volume", "close_time", "created_time"]
+
+def fmt_strike(v):
+    if pd.isna(v):
+        return "—"
+    return f"{v:,.0f}" if abs(v) >= 100 else f"{v:,.2f}"
+
+@st.cache_data(max_entries=4, show_spinner=False)
+def build_event_ladders(snapshot_ts, _markets):
+    """Per-event summaries and strike ladders for one Kalshi snapshot.
+
+    Cached on the snapshot timestamp, so filtering and sorting reruns only
+    touch the small event frame. Returns (events, ladder): `ladder` holds every
+    market sorted by event then strike, with `start`/`stop` in `events` giving
+    each event's row slice.
+
+    Prices are read as probabilities. "between" buckets are normalized to sum
+    to one; "greater"/"less" ladders are made monotone (cummin / cummax) and
+    differenced, with the tail beyond the outer strike shown on that row. In
+    events that have "between" buckets, greater/less markets are the open-ended
+    tail buckets and count as plain bucket mass.
+    """
+    df = pd.DataFrame(_markets).reindex(columns=LADDER_COLS)
+    et = df["event_ticker"].fillna("")
+    df["event_ticker"] = et.where(et != "", df["ticker"].fillna(""))
+    df["series"] = np.where(df["event_ticker"].str.contains("-"),
+                            df["event_ticker"].str.split("-").str[0], df["event_ticker"].str[:6])
+    df["yes"] = df["last_price"].fillna(0).astype(float).clip(0, 100) / 100
+    df["vol"] = df["volume_24h"].fillna(df["volume"]).fillna(0).astype(int)
+
+    kind = df["strike_type"].fillna("").str.replace("_or_equal", "")
+    floor, cap = df["floor_strike"].astype(float), df["cap_strike"].astype(float)
+    df["strike"] = np.select([kind == "between", kind == "greater", kind == "less"],
+                             [(floor + cap) / 2, floor, cap], np.nan)
+    df["kind"] = np.where(df["strike"].notna(), kind, "outcome")
+    df = df.sort_values(["event_ticker", "strike", "yes"], ascending=[True, True, False],
+                        kind="stable", ignore_index=True)
+
+    # Implied probability mass per row; monotone fixes run per (event, ladder).
+    # Each row is one bucket (lo, hi]; a pure ladder's open tail sits on its
+    # outer strike: below the first "greater" row, above the last "less" row.
+    first = ~df["event_ticker"].duplicated()
+    bucketed = (df["kind"] == "between").groupby(df["event_ticker"]).transform("any")
+    shape = df["kind"].where(~bucketed, "between")
+    lg = [df["event_ticker"], shape]
+    pairs = pd.concat(lg, axis=1)
+    ladder_start, ladder_end = ~pairs.duplicated(), ~pairs.duplicated(keep="last")
+    sf  = df["yes"].groupby(lg).cummin()           # P(X > k), non-increasing
+    cdf = df["yes"].groupby(lg).cummax()           # P(X < k), non-decreasing
+    sf_next  = sf.groupby(lg).shift(-1).fillna(0)
+    cdf_prev = cdf.groupby(lg).shift(1).fillna(0)
+    is_gt, is_lt = shape == "greater", shape == "less"
+    bucket = np.select([is_gt, is_lt], [sf - sf_next, cdf - cdf_prev], df["yes"])
+    before = np.where(is_gt & ladder_start, 1 - sf, 0)
+    after  = np.where(is_lt & ladder_end, 1 - cdf, 0)
+
+    strike = df["strike"]
+    lo = np.select([is_gt, is_lt, df["kind"] == "less"],
+                   [strike, strike.groupby(lg).shift(1), np.nan], df["floor_strike"].astype(float))
+    hi = np.select([is_gt, is_lt, df["kind"] == "greater"],
+                   [strike.groupby(lg).shift(-1), strike, np.nan], df["cap_strike"].astype(float))
+    lo, hi = pd.Series(lo).fillna(pd.Series(hi)).values, pd.Series(hi).fillna(pd.Series(lo)).values
+    mid = (lo + hi) / 2                             # an open bucket collapses to its edge
+
+    row_mass = bucket + before + after
+    total = pd.Series(row_mass).groupby(df["event_ticker"]).transform("sum").values
+    norm = np.divide(1, total, out=np.zeros(len(df)), where=total > 0)
+    df["prob"] = row_mass * norm
+    ev = df.groupby("event_ticker", sort=False)
+    df["cum"]  = ev["prob"].cumsum()
+
+    events = ev.agg(series=("series", "first"), title=("title", "first"), kind=("kind", "first"),
+                    markets=("ticker", "size"), volume=("vol", "sum"), top=("yes", "max"),
+                    close_time=("close_time", "min"), created_time=("created_time", "max"))
+    bounds = np.flatnonzero(first.values)
+    events["start"], events["stop"] = bounds, np.append(bounds[1:], len(df))
+    ladder = events["kind"] != "outcome"
+
+    # Mean weights each bucket at its midpoint and each tail at its edge. The
+    # median is interpolated inside the bucket where the cumulative mass
+    # crosses one half, so both encodings of one distribution agree.
+    point_mass = (bucket * mid + before * lo + after * hi) * norm
+    events["mean"] = pd.Series(point_mass).groupby(df["event_ticker"]).sum()
+    cross = df.index[df["cum"] >= 0.5 - 1e-9].to_series().groupby(df["event_ticker"]).first()
+    at = cross.values
+    r = 0.5 - (df["cum"] - df["prob"]).values[at] - (before * norm)[at]
+    b = (bucket * norm)[at]
+    frac = np.clip(np.divide(r, b, out=np.ones(len(at)), where=b > 0), 0, 1)
+    median = np.where(r <= 0, lo[at], lo[at] + frac * (hi[at] - lo[at]))
+    events["median"]    = pd.Series(median, index=cross.index)
+    events["median_at"] = cross
+    events.loc[~ladder, ["median", "mean"]] = np.nan
+    mode = df.loc[ev["prob"].idxmax()].set_index("event_ticker")
+    events["mode_label"], events["mode_prob"] = mode["subtitle"].fillna(mode["title"]), mode["prob"]
+    # A lone market normalizes to 100%, so rank it by its own YES price instead.
+    events["sort_prob"] = events["mode_prob"].where(events["markets"] > 1, events["top"])
+    subtitles = ev["subtitle"].agg(lambda s: " ".join(s.dropna()))
+    events["search"] = (events.index.to_series() + " " + events["title"].fillna("") + " " + subtitles).str.lower()
+    return events.reset_index(), df
+
+def event_card_html(e, rows):
+    """One Kalshi event: headline stats, implied-distribution bars and a collapsible ladder."""
+    close_str = ""
+    if isinstance(e["close_time"], str) and e["close_time"]:
+        try:
+            close_str = datetime.fromisoformat(e["close_time"].replace("Z", "+00:00")).strftime("%b %d, %Y")
+        except ValueError:
+            close_str = e["close_time"][:10]
+    vol_str = f"{e['volume']:,}" if e["volume"] else "—"
+    label   = escape(str(e["mode_label"] or ""))
+    implied = fmt_pct_arr(rows["prob"].values * 100)
+
+    if e["kind"] != "outcome" and e["markets"] > 1:
+        peak = rows["prob"].max() or 1
+        mid  = rows.index.values == e["median_at"]
+        bars = "".join(f'<div class="{"mid" if m else ""}" style="height:{p / peak * 100:.0f}%" '
+                       f'title="{escape(str(t or ""))}: {ip}"></div>'
+                       for p, ip, m, t in zip(rows["prob"], implied, mid, rows["subtitle"]))
+        head = f"""
+          <div class="kalshi-dist">{bars}</div>
+          <div class="kalshi-stats">
+            <span>Median <b>{fmt_strike(e['median'])}</b></span>
+            <span>Expected <b>{fmt_strike(e['mean'])}</b></span>
+            <span>Most likely <b>{label}</b> · {e['mode_prob']:.0%}</span>
+          </div>"""
+    else:
+        yes_pct  = round(e["mode_prob"] * 100) if e["markets"] > 1 else round(e["top"] * 100)
+        bar_color = "#16a34a" if yes_pct >= 50 else "#dc2626"
+        bar_bg    = "#dcfce7" if yes_pct >= 50 else "#fee2e2"
+        head = f"""
+          <div class="kalshi-prob-bar" style="background:{bar_bg}">
+            <div class="kalshi-prob-fill" style="width:{yes_pct}%; background:{bar_color}"></div>
+          </div>
+          <div class="kalshi-pcts">
+            <span class="kalshi-yes">{label + " &nbsp;" if e["markets"] > 1 else "YES &nbsp;"}{yes_pct}{"%" if e["markets"] > 1 else "¢"}</span>
+            {'' if e["markets"] > 1 else f'<span class="kalshi-no">NO &nbsp;{100 - yes_pct}¢</span>'}
+          </div>"""
+
+    ladder = ""
+    if e["markets"] > 1:
+        body = "".join(
+            f'<tr><td>{escape(str(sub if isinstance(sub, str) else tk))}</td><td>{lp:.0f}¢</td>'
+            f'<td>{ip}</td><td>{v:,}</td></tr>'
+            for sub, tk, lp, ip, v in zip(rows["subtitle"], rows["ticker"], rows["yes"] * 100, implied, rows["vol"])
+        )
+        ladder = f"""
+          <details><summary>Strike ladder · {e['markets']} markets</summary>
+            <table class="vol-table">
+              <thead><tr><th>Outcome</th><th>Yes</th><th>Implied</th><th>Vol 24h</th></tr></thead>
+              <tbody>{body}</tbody>
+            </table>
+          </details>"""
+
+    return f"""
+    <div class="kalshi-card">
+      <div class="kalshi-event">{escape(e['event_ticker'])}</div>
+      <div class="kalshi-title">{escape(str(e['title'] or 'Untitled'))}</div>{head}
+      <div class="kalshi-meta">
+        <span>Vol 24h: {vol_str}</span>
+        <span>Closes {close_str}</span>
+      </div>{ladder}
+    </div>"""
+
+# ── ALERT ENGINE ──────────────────────────────────────────────────────────────
+class AlertEngine:
+    """Background evaluator for watch rules.
+
+    Rules are indexed by the input they depend on: flag rules by ticker, Kalshi
+    rules by market, event or series ticker with thresholds kept sorted. Each
+    refresh diffs the new inputs against the previous ones and only touches
+    rules behind changed keys; a Kalshi move is resolved by bisecting the
+    thresholds between the old and new price. New rules are evaluated once
+    against current inputs: flag rules against the flags already present,
+    Kalshi rules against current prices. Fired alerts go to SQLite, along with
+    the last-seen flags and prices so a restart doesn't re-fire old news.
+    """
+    def __init__(self, path, get_markets, load, flags_of, interval=ALERT_INTERVAL):
+        self.get_markets, self.load, self.flags_of, self.interval = get_markets, load, flags_of, interval
+        self.lock = threading.RLock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS rules (id INTEGER PRIMARY KEY, kind TEXT, target TEXT, op TEXT,
+                                              threshold REAL, text TEXT, created REAL);
+            CREATE TABLE IF NOT EXISTS alerts (id INTEGER PRIMARY KEY, rule_id INTEGER, fired REAL,
+                                               message TEXT, read INTEGER DEFAULT 0);
+            CREATE TABLE IF NOT EXISTS seen_flags (ticker TEXT PRIMARY KEY, flags TEXT);
+            CREATE TABLE IF NOT EXISTS seen_prices (ticker TEXT PRIMARY KEY, price NUMERIC);
+        """)
+        self.rules = {}
+        self.by_ticker = defaultdict(set)       # ticker -> flag rule ids
+        self.above = defaultdict(list)          # kalshi key -> sorted [(threshold, rule id)]
+        self.below = defaultdict(list)
+        self.inputs = {}
+        self.dirty = set()
+        self.last_cycle = None
+        for row in self.db.execute("SELECT id, kind, target, op, threshold, text FROM rules"):
+            self._index(dict(zip(("id", "kind", "target", "op", "threshold", "text"), row)))
+        self.flags  = {t: frozenset(f.split("\n")) - {""} for t, f in self.db.execute("SELECT ticker, flags FROM seen_flags")}
+        self.prices = dict(self.db.execute("SELECT ticker, price FROM seen_prices"))
+        self._done = threading.Event()
+
+    def start(self):
+        threading.Thread(target=self._loop, daemon=True, name="alerts").start()
+        return self
+
+    def _loop(self):
+        while True:
+            try:
+                self.run_cycle()
+            except Exception as e:
+                self.last_cycle = {"at": time.time(), "error": str(e)}
+            if self._done.wait(self.interval):
+                return
+
+    def _index(self, rule):
+        self.rules[rule["id"]] = rule
+        if rule["kind"] == "flag":
+            for sym in rule["target"].split(","):
+                self.by_ticker[sym].add(rule["id"])
+        else:
+            side = self.above if rule["op"] == "above" else self.below
+            side[rule["target"]].insert(bisect_right(side[rule["target"]], (rule["threshold"], rule["id"])),
+                                        (rule["threshold"], rule["id"]))
+
+    def add_rule(self, kind, target, op=None, threshold=None, text=""):
+        with self.lock:
+            cur = self.db.execute("INSERT INTO rules (kind, target, op, threshold, text, created) VALUES (?,?,?,?,?,?)",
+                                  (kind, target, op, threshold, text, time.time()))
+            self.db.commit()
+            self._index({"id": cur.lastrowid, "kind": kind, "target": target, "op": op,
+                         "threshold": threshold, "text": text})
+            self.dirty.add(cur.lastrowid)
+            return cur.lastrowid
+
+    def delete_rule(self, rule_id):
+        with self.lock:
+            rule = self.rules.pop(rule_id, None)
+            if rule is None:
+                return
+            if rule["kind"] == "flag":
+                for sym in rule["target"].split(","):
+                    self.by_ticker[sym].discard(rule_id)
+                    if not self.by_ticker[sym]:
+                        del self.by_ticker[sym]
+            else:
+                side = self.above if rule["op"] == "above" else self.below
+                side[rule["target"]].remove((rule["threshold"], rule_id))
+                if not side[rule["target"]]:
+                    del side[rule["target"]]
+            self.db.execute("DELETE FROM rules WHERE id = ?", (rule_id,))
+            self.db.commit()
+
+    def _flag_hits(self, rule_ids, sym, flags):
+        return [(rid, f"{sym}: {f}") for rid in rule_ids for f in flags
+                if rid in self.rules and self.rules[rid]["text"].lower() in f.lower()]
+
+    def _kalshi_hits(self, rule, markets):
+        """One alert if a new Kalshi rule's markets are already past its threshold."""
+        t, above = rule["threshold"], rule["op"] == "above"
+        hits = [(m.get("ticker", ""), m.get("last_price") or 0) for m in markets
+                if rule["target"] in (m.get("ticker", ""), m.get("event_ticker", ""), kalshi_series(m))]
+        hits = [(tk, p) for tk, p in hits if (p >= t if above else p < t)]
+        if not hits:
+            return []
+        shown = ", ".join(f"{tk} {p}¢" for tk, p in hits[:3]) + (f" +{len(hits) - 3} more" if len(hits) > 3 else "")
+        return [(rule["id"], f"{rule['target']} already {rule['op']} {t:.0f}¢: {shown}")]
+
+    def run_cycle(self):
+        t = time.perf_counter()
+        with self.lock:
+            tickers = list(self.by_ticker)
+            watch_kalshi = bool(self.above or self.below)
+        loaded = {}
+        for sym in tickers:
+            try:
+                loaded[sym] = self.load(sym)
+            except Exception:
+                continue
+        markets = self.get_markets()[0] if watch_kalshi else []
+
+        fired, changed = [], 0
+        with self.lock:
+            # New rules see the flags and prices already present.
+            dirty, self.dirty = self.dirty, set()
+            fresh = set()
+            for rid in dirty:
+                rule = self.rules.get(rid)
+                if not rule:
+                    continue
+                if rule["kind"] == "flag":
+                    for sym in rule["target"].split(","):
+                        fired += self._flag_hits([rid], sym, sorted(self.flags.get(sym, ())))
+                elif markets:
+                    fresh.add(rid)
+                    fired += self._kalshi_hits(rule, markets)
+                else:
+                    self.dirty.add(rid)   # no market data yet; try next cycle
+
+            for sym, data in loaded.items():
+                if data is None or data is self.inputs.get(sym):
+                    continue
+                self.inputs[sym] = data
+                flags = frozenset(self.flags_of(data))
+                appeared = flags - self.flags.get(sym, frozenset())
+                if flags != self.flags.get(sym):
+                    self.db.execute("INSERT OR REPLACE INTO seen_flags VALUES (?, ?)", (sym, "\n".join(sorted(flags))))
+                self.flags[sym] = flags
+                if appeared:
+                    changed += 1
+                    fired += self._flag_hits(self.by_ticker.get(sym, ()), sym, sorted(appeared))
+
+            if watch_kalshi:
+                prices = {}
+                for m in markets:
+                    ticker, price = m.get("ticker", ""), m.get("last_price") or 0
+                    prices[ticker] = price
+                    old = self.prices.get(ticker)
+                    if old is None or old == price:
+                        continue
+                    changed += 1
+                    rising = price > old
+                    lo, hi = (old, price) if rising else (price, old)
+                    for key in {ticker, m.get("event_ticker", ""), kalshi_series(m)}:
+                        side = (self.above if rising else self.below).get(key)
+                        if side:
+                            for threshold, rid in side[bisect_right(side, (lo, float("inf"))):
+                                                       bisect_right(side, (hi, float("inf")))]:
+                                if rid in fresh:
+                                    continue
+                                fired.append((rid, f"{ticker} crossed {'above' if rising else 'below'} "
+                                                   f"{threshold:.0f}¢ ({old}¢ → {price}¢)"))
+                self.db.executemany("INSERT OR REPLACE INTO seen_prices VALUES (?, ?)",
+                                    [(tk, p) for tk, p in prices.items() if self.prices.get(tk) != p])
+                self.db.executemany("DELETE FROM seen_prices WHERE ticker = ?",
+                                    [(tk,) for tk in self.prices.keys() - prices.keys()])
+                self.prices = prices
+
+            if fired:
+                now = time.time()
+                self.db.executemany("INSERT INTO alerts (rule_id, fired, message) VALUES (?,?,?)",
+                                    [(rid, now, msg) for rid, msg in fired])
+            self.db.commit()
+        self.last_cycle = {"at": time.time(), "changed": changed, "fired": len(fired),
+                           "rules": len(self.rules), "ms": (time.perf_counter() - t) * 1000}
+        return len(fired)
+
+    def rules_frame(self):
+        with self.lock:
+            return pd.read_sql_query("SELECT id, kind, target, op, threshold, text FROM rules ORDER BY id DESC", self.db)
+
+    def inbox(self, limit=50):
+        with self.lock:
+            return pd.read_sql_query("SELECT id, fired, message, read FROM alerts ORDER BY id DESC LIMIT ?",
+                                     self.db, params=(limit,))
+
+    def unread(self):
+        with self.lock:
+            return self.db.execute("SELECT COUNT(*) FROM alerts WHERE read = 0").fetchone()[0]
+
+    def mark_all_read(self):
+        with self.lock:
+            self.db.execute("UPDATE alerts SET read = 1 WHERE read = 0")
+            self.db.commit()
+
+@st.cache_resource
+def alert_engine():
+    return AlertEngine(ALERTS_DB, get_kalshi_markets, load_ticker, lambda d: build_flags(d[0], d[1])).start()
+
+# ── STATIC SNAPSHOT ───────────────────────────────────────────────────────────
+SNAPSHOT_CSS = """
+<style>
+body { margin: 0; padding: 1rem 2rem 2rem 2rem; background: #ffffff; color: #0f172a; }
+a { color: #2563eb; text-decoration: none; }
+.snap-metrics { display: grid; grid-template-columns: repeat(4, 1fr); gap: 1rem; margin-bottom: 1.4rem; }
+.snap-metric { background: #f8fafc; border: 1px solid #e2e8f0; border-radius: 8px; padding: 0.8rem 1rem; }
+.snap-metric label { color: #64748b; font-size: 0.7rem; text-transform: uppercase; letter-spacing: 0.08em; }
+.snap-metric .v { font-size: 1.3rem; font-weight: 700; margin-top: 0.2rem; }
+.snap-row { display: grid; grid-template-columns: 6fr 4fr; gap: 2rem; margin-bottom: 1.4rem; }
+.snap-axis { display: flex; justify-content: space-between; color: #94a3b8; font-size: 0.7rem; margin-top: 0.3rem; }
+.snap-news { display: grid; grid-template-columns: 1fr 1fr; gap: 0 1rem; }
+@media (max-width: 800px) {
+  .snap-metrics { grid-template-columns: repeat(2, 1fr); }
+  .snap-row, .snap-news { grid-template-columns: 1fr; }
+}
+</style>
+"""
+
+def area_chart_svg(index, y, height=260):
+    """Plain SVG area chart, the static stand-in for the plotly S&P line."""
+    y = np.asarray(y, dtype=float)
+    width = 1000
+    lo, hi = y.min() * 0.995, y.max() * 1.005
+    xs = np.linspace(0, width, len(y))
+    ys = height - (y - lo) / ((hi - lo) or 1) * height
+    pts = " ".join(f"{a:.1f},{b:.1f}" for a, b in zip(xs, ys))
+    is_up = y[-1] >= y[0]
+    color, fill = ("#16a34a", "22,163,74") if is_up else ("#dc2626", "220,38,38")
+    return f"""
+    <svg viewBox="0 0 {width} {height}" preserveAspectRatio="none" style="width:100%;height:{height}px;background:#f8fafc;border-radius:6px">
+      <polygon points="0,{height} {pts} {width},{height}" fill="rgba({fill},0.07)"/>
+      <polyline points="{pts}" fill="none" stroke="{color}" stroke-width="2" vector-effect="non-scaling-stroke"/>
+    </svg>
+    <div class="snap-axis"><span>{index[0]:%b %d}</span><span>low {y.min():,.0f} · high {y.max():,.0f} · last <b>{y[-1]:,.0f}</b></span><span>{index[-1]:%b %d}</span></div>"""
+
+def render_dashboard_snapshot():
+    """Self-contained HTML page of the Market Dashboard: no JS, no session."""
+    indices, hist = get_indices(), get_sp500_history()
+    vol_df, news  = get_top_volume(), get_market_news()
+
+    cards = []
+    for name, d in indices.items():
+        price_str = f"{d['price']:,.2f}" if d["price"] else "—"
+        delta = ""
+        if d["change"] is not None:
+            cls = "pos" if d["change"] >= 0 else "neg"
+            delta = f'<div class="{cls}">{d["change"]:+.2f}%</div>'
+        cards.append(f'<div class="snap-metric"><label>{name}</label><div class="v">{price_str}</div>{delta}</div>')
+
+    if not hist.empty:
+        keep  = lttb(hist["Close"].values, 200)
+        chart = area_chart_svg(hist.index[keep], hist["Close"].values[keep])
+    else:
+        chart = "<p>S&amp;P 500 history unavailable.</p>"
+    volume = volume_table_html(vol_df) if not vol_df.empty else "<p>Volume data unavailable.</p>"
+    cols   = ["".join(news_card_html(item) for item in news[i::2]) for i in range(2)]
+
+    return f"""<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<meta http-equiv="refresh" content="{SNAPSHOT_INTERVAL}">
+<title>MarketLens — Market Dashboard</title>
+{APP_CSS}
+{SNAPSHOT_CSS}
+</head>
+<body>
+<div class="app-header">
+  <div style="display:flex; align-items:baseline; gap:0.5rem;">
+    <span class="app-logo">◆ MarketLens</span>
+    <span class="app-tagline">Market Dashboard · snapshot</span>
+  </div>
+  <span class="app-time">{datetime.now():%b %d, %Y  %H:%M} · <a href="{escape(LIVE_APP_URL)}">Open live app →</a></span>
+</div>
+<div class="snap-metrics">{"".join(cards)}</div>
+<div class="snap-row">
+  <div><div class="section-label">S&amp;P 500 — 3 Month Performance</div>{chart}</div>
+  <div><div class="section-label">Top Volume Today</div>{volume}</div>
+</div>
+<div class="section-label">Market News</div>
+<div class="snap-news"><div>{cols[0]}</div><div>{cols[1]}</div></div>
+</body>
+</html>
+"""
+
+def write_snapshot(path=SNAPSHOT_PATH):
+    html = render_dashboard_snapshot()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(html)
+    os.replace(tmp, path)   # readers never see a half-written page
+
 # ── APP HEADER ────────────────────────────────────────────────────────────────
 now = datetime.now().strftime("%b %d, %Y  %H:%M")
 st.markdown(f"""
@@ -435,12 +1493,18 @@ st.markdown(f"""
 """, unsafe_allow_html=True)
 
 # ── TABS ──────────────────────────────────────────────────────────────────────
-tab_dash, tab_earn, tab_kalshi = st.tabs(["  Market Dashboard  ", "  Earnings Analyzer  ", "  Kalshi Markets  "])
+# Start every tab's upstream fetches now so they overlap instead of queueing.
+for fn in (get_indices, get_sp500_history, get_top_volume, get_market_news, get_kalshi_markets):
+    fn.prefetch()
+
+tab_dash, tab_earn, tab_kalshi, tab_alerts = st.tabs(["  Market Dashboard  ", "  Earnings Analyzer  ",
+                                                      "  Kalshi Markets  ", "  Alerts  "])
 
 # ══════════════════════════════════════════════════════════════════════════════
 # MARKET DASHBOARD
 # ══════════════════════════════════════════════════════════════════════════════
 with tab_dash:
+    set_latency_budget(TAB_BUDGETS["dashboard"])
 
     # ── Index bar ─────────────────────────────────────────────────────────────
     indices = get_indices()
@@ -450,82 +1514,46 @@ with tab_dash:
         delta_str = f"{d['change']:+.2f}%" if d["change"] is not None else None
         col.metric(name, price_str, delta_str)
 
-    st.markdown("<div style='height:0.6rem'></div>", unsafe_allow_html=True)
+    st.markdown(f"<div style='height:1.1rem'>{as_of_html(get_indices)}</div>", unsafe_allow_html=True)
 
     # ── S&P Chart + Volume ────────────────────────────────────────────────────
     left, right = st.columns([6, 4], gap="large")
 
     with left:
-        st.markdown('<div class="section-label">S&P 500 — 3 Month Performance</div>', unsafe_allow_html=True)
         hist = get_sp500_history()
+        st.markdown(f'<div class="section-label">S&P 500 — 3 Month Performance{as_of_html(get_sp500_history)}</div>', unsafe_allow_html=True)
         if not hist.empty:
-            start = hist["Close"].iloc[0]
-            end   = hist["Close"].iloc[-1]
-            is_up = end >= start
-            line_color = "#16a34a" if is_up else "#dc2626"
-            fill_rgb   = "22,163,74" if is_up else "220,38,38"
-            fig = go.Figure()
-            fig.add_trace(go.Scatter(
-                x=hist.index, y=hist["Close"],
-                fill="tozeroy", fillcolor=f"rgba({fill_rgb},0.07)",
-                line=dict(color=line_color, width=2),
-                hovertemplate="%{x|%b %d}<br><b>%{y:,.0f}</b><extra></extra>",
-            ))
-            apply_chart_style(fig, height=280)
-            y_min = hist["Close"].min() * 0.995
-            y_max = hist["Close"].max() * 1.005
-            fig.update_yaxes(range=[y_min, y_max])
+            keep = lttb(hist["Close"].values)
+            fig = price_line_figure(hist.index[keep], hist["Close"].values[keep], height=280)
             st.plotly_chart(fig, use_container_width=True, config={"displayModeBar": False})
+        elif get_sp500_history.as_of() is None:
+            st.info("Loading S&P 500 history...")
 
     with right:
-        st.markdown('<div class="section-label">Top Volume Today</div>', unsafe_allow_html=True)
         vol_df = get_top_volume()
+        st.markdown(f'<div class="section-label">Top Volume Today{as_of_html(get_top_volume)}</div>', unsafe_allow_html=True)
         if not vol_df.empty:
-            rows_html = ""
-            for _, row in vol_df.iterrows():
-                chg = row["change"]
-                chg_str = f"{chg:+.1f}%" if chg is not None and not pd.isna(chg) else "—"
-                cls = "pos" if (chg is not None and not pd.isna(chg) and chg >= 0) else "neg"
-                rows_html += f"""
-                <tr>
-                  <td>{row['ticker']}</td>
-                  <td>${row['price']:.2f}</td>
-                  <td class="{cls}">{chg_str}</td>
-                  <td>{fmt_vol(row['volume'])}</td>
-                </tr>"""
-            st.markdown(f"""
-            <table class="vol-table">
-              <thead><tr><th>Ticker</th><th>Price</th><th>Chg %</th><th>Volume</th></tr></thead>
-              <tbody>{rows_html}</tbody>
-            </table>""", unsafe_allow_html=True)
+            st.markdown(volume_table_html(vol_df), unsafe_allow_html=True)
         else:
-            st.info("Volume data unavailable.")
+            st.info("Loading volume data..." if get_top_volume.as_of() is None else "Volume data unavailable.")
 
     st.markdown("<div style='height:1rem'></div>", unsafe_allow_html=True)
 
     # ── News Feed ─────────────────────────────────────────────────────────────
-    st.markdown('<div class="section-label">Market News</div>', unsafe_allow_html=True)
     news = get_market_news()
+    st.markdown(f'<div class="section-label">Market News{as_of_html(get_market_news)}</div>', unsafe_allow_html=True)
     if news:
         nc = st.columns(2)
         for i, item in enumerate(news):
-            open_a  = f'<a href="{item["link"]}" target="_blank" style="text-decoration:none">' if item["link"] else ""
-            close_a = "</a>" if item["link"] else ""
-            nc[i % 2].markdown(f"""
-            <div class="news-card">
-              {open_a}<div class="news-headline">{item['title']}</div>{close_a}
-              <div class="news-meta">
-                <span class="news-tag">{item['ticker']}</span>
-                {item['publisher']}{"  ·  " + item['time'] if item['time'] else ""}
-              </div>
-            </div>""", unsafe_allow_html=True)
+            nc[i % 2].markdown(news_card_html(item), unsafe_allow_html=True)
     else:
-        st.info("News unavailable at this time.")
+        st.info("Loading news..." if get_market_news.as_of() is None else "News unavailable at this time.")
 
 # ══════════════════════════════════════════════════════════════════════════════
 # EARNINGS ANALYZER
 # ══════════════════════════════════════════════════════════════════════════════
 with tab_earn:
+    set_latency_budget(TAB_BUDGETS["earnings"])
 
     # ── Suggested tickers ─────────────────────────────────────────────────────
     st.markdown('<div class="section-label">Popular Tickers — Click to Load</div>', unsafe_allow_html=True)
@@ -559,6 +1587,33 @@ with tab_earn:
                         st.session_state.selected_ticker = sym
                         st.rerun()
 
+    # ── Universe event study ──────────────────────────────────────────────────
+    with st.expander(f"Earnings Reaction Study — {len(EVENT_UNIVERSE)} Tickers"):
+        if st.checkbox("Run across the universe", key="run_universe_study"):
+            with st.spinner("Aligning earnings dates with price history..."):
+                uni, fetch_s, engine_s = run_universe_study(EVENT_UNIVERSE)
+            if uni is None:
+                st.info("Loading earnings history — the study will update when it arrives.")
+            elif uni.empty:
+                st.info("Earnings history unavailable.")
+            else:
+                st.caption(f"{len(uni):,} events across {uni['symbol'].nunique()} tickers · "
+                           f"inputs fetched in {fetch_s:.1f} s · abnormal returns computed in {engine_s*1000:.0f} ms")
+                st.dataframe(summarize_event_study(uni).round(2), use_container_width=True)
+                first = next(iter(EVENT_WINDOWS))
+                pts = uni.dropna(subset=[first, "surprise"])
+                fig_u = go.Figure(go.Scattergl(
+                    x=pts["surprise"].clip(-100, 100), y=pts[first], mode="markers",
+                    marker=dict(size=5, color="#2563eb", opacity=0.45),
+                    text=pts["symbol"] + " " + pts["date"].dt.strftime("%b '%y"),
+                    hovertemplate="%{text}<br>Surprise %{x:+.1f}%<br><b>%{y:+.2f}%</b><extra></extra>",
+                ))
+                apply_chart_style(fig_u, height=260)
+                fig_u.update_layout(hovermode="closest")
+                fig_u.update_xaxes(title_text="EPS surprise %", ticksuffix="%")
+                fig_u.update_yaxes(title_text=first, ticksuffix="%")
+                st.plotly_chart(fig_u, use_container_width=True, config={"displayModeBar": False})
+
     # ── Resolve ticker ────────────────────────────────────────────────────────
     active = st.session_state.selected_ticker
     if go_btn and query:
@@ -566,14 +1621,19 @@ with tab_earn:
         st.session_state.selected_ticker = active
 
     # ── Analysis ──────────────────────────────────────────────────────────────
+    loaded = None
     if active:
         with st.spinner(f"Loading {active}..."):
             try:
-                info, income_q, balance_q, cashflow_q, earnings_hist = load_ticker(active)
+                loaded = load_ticker(active)
             except Exception as e:
                 st.error(f"Could not load data for **{active}**: {e}")
                 st.stop()
+        if loaded is None:
+            st.info(f"Still loading **{active}** — the page will update when it arrives.")
 
+    if loaded is not None:
+        info, income_q, balance_q, cashflow_q, earnings_hist = loaded
         if not info or (not info.get("currentPrice") and not info.get("regularMarketPrice")):
             st.error(f"No data found for **{active}**. Check the ticker and try again.")
             st.stop()
@@ -585,7 +1645,7 @@ with tab_earn:
 
         st.markdown(f"<div style='margin-top:1.5rem'></div>", unsafe_allow_html=True)
         st.markdown(f"<h2 style='color:#0f172a;margin:0;font-size:1.5rem;font-weight:800;'>{name}</h2>", unsafe_allow_html=True)
-        st.markdown(f"<div style='color:#64748b;font-size:0.8rem;margin-bottom:1.2rem;'>{active} &nbsp;·&nbsp; {sector} &nbsp;·&nbsp; {industry}</div>", unsafe_allow_html=True)
+        st.markdown(f"<div style='color:#64748b;font-size:0.8rem;margin-bottom:1.2rem;'>{active} &nbsp;·&nbsp; {sector} &nbsp;·&nbsp; {industry}{as_of_html(load_ticker, active)}</div>", unsafe_allow_html=True)
 
         # Summary
         st.markdown('<div class="section-label">Quarter in Plain English</div>', unsafe_allow_html=True)
@@ -628,6 +1688,33 @@ with tab_earn:
 
         st.divider()
 
+        # Price chart
+        st.markdown('<div class="section-label">Price</div>', unsafe_allow_html=True)
+        range_key = st.radio("Range", list(PRICE_RANGES), index=list(PRICE_RANGES).index("1Y"),
+                             horizontal=True, label_visibility="collapsed", key="price_range")
+        chart = get_price_chart(active, range_key)
+        if chart == {}:
+            st.info(f"Loading {range_key} price history...")
+        elif chart is None:
+            st.info(f"No {range_key} price history for {active}.")
+        else:
+            series = chart["series"]
+            intraday = range_key in INTRADAY_RANGES
+            fig_px = price_line_figure(
+                series.index, series.values, height=300,
+                hover=("%{x|%b %d %H:%M}" if intraday else "%{x|%b %d, %Y}") + "<br><b>$%{y:,.2f}</b><extra></extra>",
+            )
+            if not chart["marks"].empty:
+                fig_px.add_trace(go.Scatter(
+                    x=chart["marks"].index, y=chart["marks"].values, name="Earnings", mode="markers",
+                    marker=dict(symbol="diamond", size=9, color="#7c3aed", line=dict(color="white", width=1)),
+                    hovertemplate="Earnings %{x|%b %d, %Y}<br><b>$%{y:,.2f}</b><extra></extra>",
+                ))
+            if intraday:
+                fig_px.update_xaxes(rangebreaks=[dict(bounds=["sat", "mon"]), dict(bounds=[16, 9.5], pattern="hour")])
+            st.plotly_chart(fig_px, use_container_width=True, config={"displayModeBar": False})
+            st.caption(f"{len(series):,} of {chart['points']:,} points")
+
         # EPS Beat/Miss
         if earnings_hist is not None and not earnings_hist.empty and "epsActual" in earnings_hist.columns:
             st.markdown('<div class="section-label">EPS: Actual vs Estimate</div>', unsafe_allow_html=True)
@@ -642,6 +1729,33 @@ with tab_earn:
             apply_chart_style(fig_eps, height=240)
             st.plotly_chart(fig_eps, use_container_width=True, config={"displayModeBar": False})
 
+        # Post-earnings price reaction
+        events = get_earnings_events(active)
+        closes = get_daily_closes((active,)) if events is not None and not events.empty else None
+        if closes is not None:
+            reactions = event_study(closes, events).dropna(subset=list(EVENT_WINDOWS), how="all")
+            if not reactions.empty:
+                st.markdown('<div class="section-label">Post-Earnings Reaction vs S&amp;P 500</div>', unsafe_allow_html=True)
+                recent = reactions.sort_values("date").tail(12)
+                ev_labels = list(recent["date"].dt.strftime("%b %d '%y"))
+                fig_ev = go.Figure()
+                for label, color in zip(EVENT_WINDOWS, ["#2563eb", "#bfdbfe"]):
+                    fig_ev.add_trace(go.Bar(
+                        x=ev_labels, y=recent[label].round(2), name=label, marker_color=color,
+                        customdata=recent["surprise"],
+                        hovertemplate="<b>%{y:+.2f}%</b>  ·  EPS surprise %{customdata:+.1f}%<extra></extra>",
+                    ))
+                fig_ev.update_layout(barmode="group")
+                apply_chart_style(fig_ev, height=240)
+                fig_ev.update_yaxes(ticksuffix="%")
+                st.plotly_chart(fig_ev, use_container_width=True, config={"displayModeBar": False})
+
+                ev_stats = summarize_event_study(reactions)
+                ev_cols = st.columns(2 * len(EVENT_WINDOWS))
+                for i, (label, row) in enumerate(ev_stats.iterrows()):
+                    ev_cols[2*i].metric(f"{label} · Beat",   fmt_signed_pct(row["Avg % (beat)"]))
+                    ev_cols[2*i+1].metric(f"{label} · Miss", fmt_signed_pct(row["Avg % (miss)"]))
+
         # Revenue & Net Income
         if income_q is not None and not income_q.empty:
             rev_key = next((k for k in income_q.index if "Total Revenue" in k or "Revenue" in k), None)
@@ -704,23 +1818,25 @@ with tab_earn:
                     col.metric(label, fmt_large(val))
 
         # Raw data
-        with st.expander("Raw Quarterly Financials"):
+        with st.expander("Raw Financials"):
+            freq = st.radio("Frequency", ["Quarterly", "Annual"], horizontal=True,
+                            label_visibility="collapsed", key="raw_freq")
+            statements = (income_q, balance_q, cashflow_q) if freq == "Quarterly" else load_annual_statements(active)
+            if statements is None:
+                st.info("Loading annual statements...")
+                statements = (None, None, None)
             t1, t2, t3 = st.tabs(["Income Statement", "Balance Sheet", "Cash Flow"])
-            with t1:
-                if income_q is not None and not income_q.empty:
-                    st.dataframe(safe_fmt(income_q), use_container_width=True)
-            with t2:
-                if balance_q is not None and not balance_q.empty:
-                    st.dataframe(safe_fmt(balance_q), use_container_width=True)
-            with t3:
-                if cashflow_q is not None and not cashflow_q.empty:
-                    st.dataframe(safe_fmt(cashflow_q), use_container_width=True)
+            for tab, df, name in zip((t1, t2, t3), statements, ("inc", "bal", "cf")):
+                with tab:
+                    if df is not None and not df.empty:
+                        statement_grid(df, key=f"grid_{freq}_{name}")
 
 # ══════════════════════════════════════════════════════════════════════════════
 # KALSHI MARKETS
 # ══════════════════════════════════════════════════════════════════════════════
 with tab_kalshi:
-    st.markdown('<div class="section-label">Live Prediction Markets</div>', unsafe_allow_html=True)
+    set_latency_budget(TAB_BUDGETS["kalshi"])
+    st.markdown(f'<div class="section-label">Live Prediction Markets{as_of_html(get_kalshi_markets)}</div>', unsafe_allow_html=True)
 
     # ── Search + category filter ───────────────────────────────────────────────
     kcol1, kcol2 = st.columns([4, 2])
@@ -733,17 +1849,16 @@ with tab_kalshi:
                                label_visibility="collapsed")
 
     with st.spinner("Loading Kalshi markets..."):
-        markets, k_err = get_kalshi_markets()
+        (markets, k_err), k_as_of = get_kalshi_markets.entry()
 
-    if not markets:
+    if not markets and k_as_of is None:
+        st.info("Loading Kalshi markets — the page will update when they arrive.")
+    elif not markets:
         st.error(f"Could not load Kalshi markets. {k_err or 'No markets found for the selected series.'}")
     else:
-        # ── Build category list from event tickers ────────────────────────────
-        def get_series(m):
-            et = m.get("event_ticker", "") or m.get("ticker", "")
-            return et.split("-")[0] if "-" in et else et[:6]
-
-        all_series = sorted(set(get_series(m) for m in markets))
+        # ── Group the snapshot into events (once per snapshot) ─────────────────
+        events, ladder = build_event_ladders(k_as_of, markets)
+        all_series = sorted(events["series"].unique())
 
         # Friendly category labels for common series
         SERIES_LABELS = {
@@ -764,92 +1879,135 @@ with tab_kalshi:
         )
         selected_series = series_lookup.get(selected_cat_label) if selected_cat_label != "All" else None
 
-        # ── Filter markets ────────────────────────────────────────────────────
-        filtered = markets
+        # ── Filter events ─────────────────────────────────────────────────────
+        filtered = events
         if selected_series:
-            filtered = [m for m in filtered if get_series(m) == selected_series]
+            filtered = filtered[filtered["series"] == selected_series]
         if k_search:
-            q = k_search.lower()
-            filtered = [m for m in filtered if q in m.get("title", "").lower()
-                        or q in m.get("subtitle", "").lower()
-                        or q in m.get("event_ticker", "").lower()]
+            filtered = filtered[filtered["search"].str.contains(k_search.lower(), regex=False)]
 
         # ── Sort ──────────────────────────────────────────────────────────────
-        def sort_key(m):
-            lp = m.get("last_price") or 0
-            vol = m.get("volume_24h") or m.get("volume") or 0
-            ct = m.get("close_time") or "9999"
-            if k_sort == "Volume (High → Low)":
-                return -vol
-            elif k_sort == "Probability (High → Low)":
-                return -lp
-            elif k_sort == "Closing Soon":
-                return ct
-            else:
-                return m.get("created_time") or ""
-
-        filtered.sort(key=sort_key)
+        sort_by = {
+            "Volume (High → Low)":      ("volume", False),
+            "Probability (High → Low)": ("sort_prob", False),
+            "Closing Soon":             ("close_time", True),
+            "Recently Added":           ("created_time", False),
+        }[k_sort]
+        filtered = filtered.sort_values(sort_by[0], ascending=sort_by[1], na_position="last", kind="stable")
 
         # ── Stats row ────────────────────────────────────────────────────────
         s1, s2, s3 = st.columns(3)
         s1.metric("Open Markets", f"{len(markets):,}")
-        s2.metric("Showing", f"{len(filtered):,}")
-        total_vol = sum(m.get("volume_24h") or 0 for m in filtered)
-        s3.metric("24h Volume (shown)", f"{total_vol:,} contracts")
+        s2.metric("Events Shown", f"{len(filtered):,}", f"{int(filtered['markets'].sum()):,} markets", delta_color="off")
+        s3.metric("24h Volume (shown)", f"{int(filtered['volume'].sum()):,} contracts")
 
         st.markdown("<div style='height:0.5rem'></div>", unsafe_allow_html=True)
 
-        # ── Market cards ──────────────────────────────────────────────────────
-        if not filtered:
+        # ── Event cards ───────────────────────────────────────────────────────
+        if filtered.empty:
             st.info("No markets match your filter.")
         else:
             # Render in 2-column grid
             cols = st.columns(2, gap="medium")
-            for i, m in enumerate(filtered[:100]):   # cap at 100 displayed
-                title       = m.get("title", "Untitled")
-                subtitle    = m.get("subtitle", "")
-                last_price  = m.get("last_price") or 0       # cents, 0-100
-                yes_bid     = m.get("yes_bid") or 0
-                no_bid      = m.get("no_bid") or 0
-                vol_24h     = m.get("volume_24h") or m.get("volume") or 0
-                close_time  = m.get("close_time", "")
-                event_ticker = m.get("event_ticker", "")
-
-                # Probability: use last_price (in cents → %)
-                yes_pct = last_price   # already 0-100
-                no_pct  = 100 - yes_pct
-
-                # Format close date
-                close_str = ""
-                if close_time:
-                    try:
-                        dt = datetime.fromisoformat(close_time.replace("Z", "+00:00"))
-                        close_str = dt.strftime("%b %d, %Y")
-                    except:
-                        close_str = close_time[:10]
-
-                vol_str = f"{vol_24h:,}" if vol_24h else "—"
-
-                # Color the bar based on probability
-                bar_color = "#16a34a" if yes_pct >= 50 else "#dc2626"
-                bar_bg    = "#dcfce7" if yes_pct >= 50 else "#fee2e2"
-
-                cols[i % 2].markdown(f"""
-                <div class="kalshi-card">
-                  <div class="kalshi-event">{event_ticker}</div>
-                  <div class="kalshi-title">{title}{(' — ' + subtitle) if subtitle else ''}</div>
-                  <div class="kalshi-prob-bar" style="background:{bar_bg}">
-                    <div class="kalshi-prob-fill" style="width:{yes_pct}%; background:{bar_color}"></div>
-                  </div>
-                  <div class="kalshi-pcts">
-                    <span class="kalshi-yes">YES &nbsp;{yes_pct}¢</span>
-                    <span class="kalshi-no">NO &nbsp;{no_pct}¢</span>
-                  </div>
-                  <div class="kalshi-meta">
-                    <span>Vol 24h: {vol_str}</span>
-                    <span>Closes {close_str}</span>
-                  </div>
-                </div>""", unsafe_allow_html=True)
-
-            if len(filtered) > 100:
-                st.caption(f"Showing top 100 of {len(filtered)} matching markets. Use the search or category filter to narrow down.")
+            for i, e in enumerate(filtered.head(50).to_dict("records")):   # cap at 50 displayed
+                rows = ladder.iloc[e["start"]:e["stop"]]
+                cols[i % 2].markdown(event_card_html(e, rows), unsafe_allow_html=True)
+
+            if len(filtered) > 50:
+                st.caption(f"Showing top 50 of {len(filtered)} matching events. Use the search or category filter to narrow down.")
+
+# ══════════════════════════════════════════════════════════════════════════════
+# ALERTS
+# ══════════════════════════════════════════════════════════════════════════════
+with tab_alerts:
+    engine = alert_engine()
+
+    # ── Status + inbox ────────────────────────────────────────────────────────
+    a1, a2, a3, a4 = st.columns([2, 2, 3, 2])
+    a1.metric("Watch Rules", f"{len(engine.rules):,}")
+    a2.metric("Unread Alerts", f"{engine.unread():,}")
+    last = engine.last_cycle or {}
+    if "error" in last:
+        a3.metric("Last Check", datetime.fromtimestamp(last["at"]).strftime("%H:%M:%S"), "failed", delta_color="inverse")
+    elif last:
+        a3.metric("Last Check", datetime.fromtimestamp(last["at"]).strftime("%H:%M:%S"),
+                  f"{last['changed']} changed · {last['fired']} fired · {last['ms']:.0f} ms", delta_color="off")
+    else:
+        a3.metric("Last Check", "—")
+    with a4:
+        if st.button("Check now", use_container_width=True):
+            with st.spinner("Evaluating rules..."):
+                engine.run_cycle()
+            st.rerun()
+        if st.button("Mark all read", use_container_width=True):
+            engine.mark_all_read()
+            st.rerun()
+
+    st.markdown('<div class="section-label">Inbox</div>', unsafe_allow_html=True)
+    inbox = engine.inbox()
+    if inbox.empty:
+        st.info(f"No alerts yet. Rules are checked every {ALERT_INTERVAL // 60} minutes.")
+    else:
+        st.markdown("".join(
+            f'<div class="{"flag-item" if not read else "summary-item"}">'
+            f'<span class="news-tag">{datetime.fromtimestamp(fired):%b %d %H:%M}</span>{escape(msg)}</div>'
+            for fired, msg, read in zip(inbox["fired"], inbox["message"], inbox["read"])
+        ), unsafe_allow_html=True)
+
+    st.markdown("<div style='height:0.5rem'></div>", unsafe_allow_html=True)
+
+    # ── New rules ─────────────────────────────────────────────────────────────
+    st.markdown('<div class="section-label">Add a Watch Rule</div>', unsafe_allow_html=True)
+    f1, f2 = st.columns(2, gap="large")
+    with f1.form("flag_rule", clear_on_submit=True):
+        st.markdown("**Risk flag appears**")
+        w_tickers = st.text_input("Tickers (comma-separated)", placeholder="XOM, TSLA, PLTR")
+        w_text    = st.text_input("Flag contains (optional)", placeholder="e.g. debt, cash flow")
+        if st.form_submit_button("Add flag rule") and w_tickers.strip():
+            syms = sorted({t.strip().upper() for t in w_tickers.split(",") if t.strip()})
+            engine.add_rule("flag", ",".join(syms), text=w_text.strip())
+            st.rerun()
+    with f2.form("kalshi_rule", clear_on_submit=True):
+        st.markdown("**Kalshi price crosses**")
+        w_market = st.text_input("Market, event or series ticker", placeholder="KXFED or KXFED-25DEC-T4.25")
+        w_op, w_thr = st.columns(2)
+        op = w_op.selectbox("Direction", ["above", "below"])
+        threshold = w_thr.number_input("Threshold (¢)", min_value=1, max_value=99, value=70)
+        if st.form_submit_button("Add price rule") and w_market.strip():
+            engine.add_rule("kalshi", w_market.strip().upper(), op, float(threshold))
+            st.rerun()
+
+    # ── Rule list ─────────────────────────────────────────────────────────────
+    rules_df = engine.rules_frame()
+    if not rules_df.empty:
+        st.markdown('<div class="section-label">Watch Rules</div>', unsafe_allow_html=True)
+        st.dataframe(rules_df, use_container_width=True, hide_index=True, height=min(38 + 35*len(rules_df), 400))
+        d1, d2 = st.columns([1, 4])
+        del_id = d1.number_input("Rule id", min_value=int(rules_df["id"].min()), max_value=int(rules_df["id"].max()),
+                                 step=1, label_visibility="collapsed")
+        if d2.button("Delete rule"):
+            engine.delete_rule(int(del_id))
+            st.rerun()
+
+# ── PROFILE REPORT ────────────────────────────────────────────────────────────
+# Runs that end in st.stop() or st.rerun() exit before this point and are not
+# reported; their sampler thread stops on its own.
+if profiler:
+    profiler.stop()
+    render_profile(profiler)
+
+# ── SETTLE ────────────────────────────────────────────────────────────────────
+# Anything that missed its tab's budget rendered as "loading"; once it lands,
+# rerun so the page fills in without the user having to interact. The wait is
+# sliced: every st.* call is a point where Streamlit acts on a pending rerun,
+# so a click during the wait is handled right away instead of after it.
+if swr_pending:
+    slot = st.empty()
+    deadline = time.monotonic() + SWR_SETTLE
+    while True:
+        done, waiting = wait(swr_pending, timeout=SWR_POLL)
+        if not waiting or time.monotonic() >= deadline:
+            break
+        slot.empty()
+    if any(f.exception() is None for f in done):
+        st.rerun()
@@ -0,0 +1,418 @@
+"""Headless load test for MarketLens.
+
+Drives app.py through Streamlit's AppTest across many simulated sessions, with
+Yahoo Finance and Kalshi replaced by local stand-ins that sleep for a
+configurable latency. Reports rerun latency percentiles, throughput and RSS
+over time, and saves the results as JSON for comparison between commits.
+
+    python loadtest.py --sessions 20 --concurrency 8 --actions 15 --latency 0.05
+    python loadtest.py --compare loadtest_results/<earlier run>.json
+
+Tab switches happen in the browser without a rerun, so a session "visiting" a
+tab is modelled by the interactions it makes there.
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, nullcontext
+from datetime import datetime
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+import requests
+import yfinance as yf
+from streamlit.runtime import Runtime
+from streamlit.testing.v1 import AppTest, app_test, local_script_runner
+from streamlit.testing.v1.util import patch_config_options
+
+os.environ.setdefault("MARKETLENS_ALERTS_DB", ":memory:")
+
+APP_PATH    = Path(__file__).with_name("app.py")
+RESULTS_DIR = Path(__file__).with_name("loadtest_results")
+
+SEARCH_WORDS = ["apple", "bank", "energy", "semis", "retail", "biotech", "airline",
+                "software", "mining", "insurance", "pharma", "utility", "media"]
+KALSHI_QUERIES = ["fed", "bitcoin", "nba", "cpi", "s&p", "gold", "rates", "election"]
+
+# action -> relative weight in a session's random walk
+SCENARIO = {
+    "chip":          4,
+    "ticker_search": 2,
+    "price_range":   2,
+    "kalshi_search": 3,
+    "kalshi_sort":   1,
+    "dashboard":     2,
+}
+
+# ── UPSTREAM STAND-INS ────────────────────────────────────────────────────────
+LATENCY = {"yahoo": 0.0, "kalshi": 0.0}
+
+def _sleep(kind):
+    if LATENCY[kind]:
+        time.sleep(LATENCY[kind])
+
+def _rng(key):
+    return np.random.default_rng(zlib.crc32(key.encode()))
+
+PERIOD_DAYS = {"1d": 1, "2d": 2, "5d": 5, "1mo": 21, "3mo": 63, "6mo": 126, "ytd": 200, "1y": 252,
+               "2y": 504, "5y": 1260, "10y": 2520, "max": 7500}
+INTERVAL_MIN = {"1m": 1, "2m": 2, "5m": 5, "15m": 15, "30m": 30, "60m": 60, "90m": 90, "1h": 60}
+
+def fake_history(symbol, period="1mo", interval="1d"):
+    days = pd.bdate_range(end=pd.Timestamp.today().normalize(), periods=PERIOD_DAYS.get(period, 21))
+    if interval in INTERVAL_MIN:
+        step = INTERVAL_MIN[interval]
+        offsets = pd.to_timedelta(np.arange(0, 390, step), unit="min") + pd.Timedelta(hours=9, minutes=30)
+        idx = pd.DatetimeIndex([d + o for d in days for o in offsets]).tz_localize("America/New_York")
+    elif interval == "1wk":
+        idx = days[::5]
+    else:
+        idx = days
+    rng = _rng(symbol)
+    close = (50 + 200 * rng.random()) * np.exp(np.cumsum(rng.normal(0, 0.012, len(idx))))
+    return pd.DataFrame({"Open": close, "High": close * 1.01, "Low": close * 0.99, "Close": close,
+                         "Volume": rng.integers(10**5, 10**8, len(idx))}, index=idx)
+
+def _statement(symbol, rows, periods, freq):
+    cols = pd.date_range(end=pd.Timestamp.today(), periods=periods, freq=freq)[::-1]
+    rng = _rng(symbol + freq)
+    return pd.DataFrame(rng.uniform(-0.2, 1, (len(rows), periods)) * 1e10, index=rows, columns=cols)
+
+INCOME_ROWS   = ["Total Revenue", "Gross Profit", "Operating Income", "Net Income"]
+BALANCE_ROWS  = ["Cash And Cash Equivalents", "Total Debt", "Stockholders Equity", "Total Assets"]
+CASHFLOW_ROWS = ["Operating Cash Flow", "Capital Expenditure", "Free Cash Flow"]
+
+class FakeFastInfo:
+    def __init__(self, symbol):
+        rng = _rng(symbol)
+        self.previous_close = 50 + 4000 * rng.random()
+        self.last_price = self.previous_close * (1 + rng.normal(0, 0.01))
+
+class FakeTicker:
+    def __init__(self, symbol):
+        self.symbol = symbol
+        self.fast_info = FakeFastInfo(symbol)
+
+    def history(self, period="1mo", interval="1d", **kwargs):
+        _sleep("yahoo")
+        return fake_history(self.symbol, period, interval)
+
+    @property
+    def info(self):
+        _sleep("yahoo")
+        rng = _rng(self.symbol)
+        return {
+            "longName": f"{self.symbol} Holdings", "sector": "Technology", "industry": "Software",
+            "currentPrice": 50 + 400 * rng.random(), "marketCap": 1e9 * (1 + 2000 * rng.random()),
+            "totalRevenue": 1e9 * (1 + 300 * rng.random()), "trailingEps": rng.normal(4, 3),
+            "trailingPE": 10 + 40 * rng.random(), "forwardPE": 10 + 40 * rng.random(),
+            "grossMargins": rng.random(), "profitMargins": rng.normal(0.12, 0.15),
+            "revenueGrowth": rng.normal(0.08, 0.1), "earningsGrowth": rng.normal(0.1, 0.2),
+            "debtToEquity": 300 * rng.random(), "operatingCashflow": rng.normal(5e9, 6e9),
+        }
+
+    @property
+    def quarterly_financials(self):     return _statement(self.symbol, INCOME_ROWS, 8, "QE")
+    @property
+    def quarterly_balance_sheet(self):  return _statement(self.symbol, BALANCE_ROWS, 8, "QE")
+    @property
+    def quarterly_cashflow(self):       return _statement(self.symbol, CASHFLOW_ROWS, 8, "QE")
+    @property
+    def financials(self):               return _statement(self.symbol, INCOME_ROWS, 4, "YE")
+    @property
+    def balance_sheet(self):            return _statement(self.symbol, BALANCE_ROWS, 4, "YE")
+    @property
+    def cashflow(self):                 return _statement(self.symbol, CASHFLOW_ROWS, 4, "YE")
+
+    @property
+    def earnings_history(self):
+        est = _rng(self.symbol).uniform(0.5, 3, 4)
+        idx = pd.date_range(end=pd.Timestamp.today(), periods=4, freq="QE")[::-1]
+        return pd.DataFrame({"epsEstimate": est, "epsActual": est * 1.04}, index=idx)
+
+    def get_earnings_dates(self, limit=12):
+        _sleep("yahoo")
+        rng = _rng(self.symbol)
+        idx = pd.bdate_range(end=pd.Timestamp.today(), periods=63 * limit)[::-63][:limit]
+        est = rng.uniform(0.5, 3, limit)
+        act = est * (1 + rng.normal(0.03, 0.08, limit))
+        return pd.DataFrame({"EPS Estimate": est, "Reported EPS": act, "Surprise(%)": (act / est - 1) * 100},
+                            index=pd.DatetimeIndex(idx.tz_localize("America/New_York"), name="Earnings Date"))
+
+    @property
+    def news(self):
+        _sleep("yahoo")
+        return [{"content": {"title": f"{self.symbol} headline {i}", "provider": {"displayName": "Newswire"},
+                             "canonicalUrl": {"url": "https://example.com"}, "pubDate": "2026-01-01"}}
+                for i in range(3)]
+
+def fake_download(tickers, period="1mo", **kwargs):
+    _sleep("yahoo")
+    tickers = [tickers] if isinstance(tickers, str) else list(tickers)
+    frames = {t: fake_history(t, period) for t in tickers}
+    return pd.concat(frames, axis=1).swaplevel(0, 1, axis=1).sort_index(axis=1)
+
+class FakeSearch:
+    def __init__(self, query, max_results=6, **kwargs):
+        _sleep("yahoo")
+        base = int(_rng(query).integers(100))
+        self.quotes = [{"symbol": f"{query[:3].upper()}{(base + i) % 100}", "shortname": f"{query.title()} Corp {i}",
+                        "quoteType": "EQUITY"} for i in range(max_results)]
+
+class FakeResponse:
+    status_code = 200
+
+    def __init__(self, payload):
+        self._payload = payload
+
+    def json(self):
+        return self._payload
+
+def fake_kalshi_get(url, params=None, timeout=None, **kwargs):
+    _sleep("kalshi")
+    series = (params or {}).get("series_ticker", "KX")
+    rng = _rng(series)
+    markets = []
+    for e in range(4):
+        event = f"{series}-26E{e}"
+        for k in range(10):
+            lo = 100 * (k + 1)
+            markets.append({
+                "ticker": f"{event}-B{lo}", "event_ticker": event,
+                "title": f"{series} outcome for event {e}?", "subtitle": f"{lo} to {lo + 99.99}",
+                "strike_type": "between", "floor_strike": lo, "cap_strike": lo + 99.99,
+                "last_price": int(rng.integers(1, 99)), "yes_bid": int(rng.integers(1, 99)),
+                "no_bid": int(rng.integers(1, 99)), "volume": int(rng.integers(0, 50000)),
+                "volume_24h": int(rng.integers(0, 5000)), "close_time": "2026-12-31T20:00:00Z",
+                "created_time": "2026-01-01T00:00:00Z",
+            })
+    for e in range(4):   # single-market yes/no events
+        markets.append({
+            "ticker": f"{series}-26Y{e}", "event_ticker": f"{series}-26Y{e}",
+            "title": f"Will {series} resolve yes for question {e}?", "subtitle": "",
+            "strike_type": "structured", "last_price": int(rng.integers(1, 99)),
+            "yes_bid": int(rng.integers(1, 99)), "no_bid": int(rng.integers(1, 99)),
+            "volume": int(rng.integers(0, 50000)), "volume_24h": int(rng.integers(0, 5000)),
+            "close_time": f"2026-1{e}-15T20:00:00Z", "created_time": f"2026-0{e + 1}-01T00:00:00Z",
+        })
+    return FakeResponse({"markets": markets})
+
+def stub_upstreams():
+    """Patch yfinance and requests with the stand-ins; returns an ExitStack."""
+    stack = ExitStack()
+    stack.enter_context(mock.patch.object(yf, "Ticker", FakeTicker))
+    stack.enter_context(mock.patch.object(yf, "download", fake_download))
+    stack.enter_context(mock.patch.object(yf, "Search", FakeSearch))
+    stack.enter_context(mock.patch.object(requests, "get", fake_kalshi_get))
+    return stack
+
+def share_app_test_runtime():
+    """Let AppTest sessions run concurrently in one process.
+
+    AppTest installs a mock Runtime and patches config around every run and
+    tears both down afterwards, so parallel runs would pull the runtime out
+    from under each other. Keep the first mock installed for the whole test
+    (sessions then share caches, as in a real server), patch config once and
+    compile the script once instead of per run.
+    """
+    class _Slot(type(Runtime)):
+        def __setattr__(cls, name, value):
+            if name == "_instance":
+                if value is not None and Runtime._instance is None:
+                    Runtime._instance = value
+                return
+            super().__setattr__(name, value)
+
+    stack = ExitStack()
+    stack.enter_context(mock.patch.object(app_test, "Runtime", _Slot("Runtime", (Runtime,), {})))
+    stack.enter_context(patch_config_options({"global.appTest": True}))
+    stack.enter_context(mock.patch.object(app_test, "patch_config_options", lambda overrides: nullcontext()))
+    script_cache = app_test.ScriptCache()
+    for module in (app_test, local_script_runner):
+        stack.enter_context(mock.patch.object(module, "ScriptCache", lambda: script_cache))
+    stack.callback(setattr, Runtime, "_instance", None)
+    return stack
+
+# ── SESSIONS ──────────────────────────────────────────────────────────────────
+def _by_label(widgets, label):
+    for w in widgets:
+        if w.label == label:
+            return w
+    raise LookupError(f"no widget labelled {label!r} on the page")
+
+def do_action(at, action, rng):
+    if action == "chip":
+        sym = rng.choice([b.key[5:] for b in at.button if b.key and b.key.startswith("chip_")])
+        at.button(key=f"chip_{sym}").click().run()
+    elif action == "ticker_search":
+        _by_label(at.text_input, "search").input(rng.choice(SEARCH_WORDS)).run()
+        picks = [b for b in at.button if b.key and b.key.startswith("sr_")]
+        if picks:
+            rng.choice(picks).click().run()
+    elif action == "price_range":
+        radio = [r for r in at.radio if r.key == "price_range"]
+        if radio:
+            radio[0].set_value(rng.choice(radio[0].options)).run()
+        else:
+            at.run()
+    elif action == "kalshi_search":
+        query = rng.choice(KALSHI_QUERIES + [""])
+        _by_label(at.text_input, "kalshi_search").input(query).run()
+    elif action == "kalshi_sort":
+        box = _by_label(at.selectbox, "sort")
+        box.select(rng.choice(box.options)).run()
+    else:
+        at.run()
+
+def run_session(sid, args, record):
+    rng = random.Random(args.seed * 1000 + sid)
+    actions, weights = zip(*SCENARIO.items())
+    at = AppTest.from_file(str(APP_PATH), default_timeout=args.timeout)
+    steps = [("load", None)] + [(a, None) for a in rng.choices(actions, weights, k=args.actions)]
+    for action, _ in steps:
+        t = time.perf_counter()
+        try:
+            at.run() if action == "load" else do_action(at, action, rng)
+            error = repr(at.exception[0].value) if at.exception else None
+        except Exception as e:
+            error = repr(e)
+        record(sid, action, time.perf_counter() - t, error)
+        if args.think:
+            time.sleep(rng.uniform(0, args.think))
+
+# ── MEASUREMENT ───────────────────────────────────────────────────────────────
+def rss_mb():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+class RssSampler(threading.Thread):
+    def __init__(self, interval):
+        super().__init__(daemon=True)
+        self.interval, self.samples, self._done = interval, [], threading.Event()
+        self.t0 = time.perf_counter()
+
+    def run(self):
+        while not self._done.is_set():
+            self.samples.append((round(time.perf_counter() - self.t0, 2), round(rss_mb(), 1)))
+            self._done.wait(self.interval)
+
+    def stop(self):
+        self._done.set()
+        self.join()
+        self.samples.append((round(time.perf_counter() - self.t0, 2), round(rss_mb(), 1)))
+
+def percentiles(values):
+    if not values:
+        return {"n": 0}
+    a = np.asarray(values) * 1000
+    return {"n": len(a), "mean_ms": round(float(a.mean()), 1),
+            **{f"p{q}_ms": round(float(np.percentile(a, q)), 1) for q in (50, 95, 99)},
+            "max_ms": round(float(a.max()), 1)}
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=APP_PATH.parent,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return "unknown"
+
+def run(args):
+    LATENCY.update(yahoo=args.latency, kalshi=args.kalshi_latency)
+    samples, lock = [], threading.Lock()
+
+    def record(sid, action, seconds, error):
+        with lock:
+            samples.append({"session": sid, "action": action, "seconds": seconds, "error": error})
+
+    sampler = RssSampler(args.rss_interval)
+    with stub_upstreams(), share_app_test_runtime():
+        sampler.start()
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            list(pool.map(lambda sid: run_session(sid, args, record), range(args.sessions)))
+        wall = time.perf_counter() - t0
+        sampler.stop()
+
+    ok = [s for s in samples if not s["error"]]
+    by_action = {a: percentiles([s["seconds"] for s in ok if s["action"] == a])
+                 for a in ["load", *SCENARIO]}
+    rss = [mb for _, mb in sampler.samples]
+    return {
+        "commit": git_commit(),
+        "started": datetime.now().isoformat(timespec="seconds"),
+        "config": {k: v for k, v in vars(args).items() if k not in ("compare", "out")},
+        "summary": {
+            "reruns": len(samples), "errors": len(samples) - len(ok), "wall_s": round(wall, 2),
+            "throughput_rps": round(len(samples) / wall, 2) if wall else None,
+            **percentiles([s["seconds"] for s in ok]),
+            "rss_start_mb": rss[0], "rss_peak_mb": max(rss), "rss_end_mb": rss[-1],
+        },
+        "by_action": by_action,
+        "rss_mb": sampler.samples,
+        "errors": sorted({s["error"] for s in samples if s["error"]})[:20],
+    }
+
+# ── REPORTING ─────────────────────────────────────────────────────────────────
+SUMMARY_KEYS = ["reruns", "errors", "throughput_rps", "mean_ms", "p50_ms", "p95_ms", "p99_ms",
+                "max_ms", "rss_start_mb", "rss_peak_mb", "rss_end_mb"]
+
+def print_report(result, baseline=None):
+    s = result["summary"]
+    b = baseline["summary"] if baseline else {}
+    head = f"{'metric':<16}{'this run':>12}"
+    if baseline:
+        head += f"{baseline['commit']:>12}{'change':>10}"
+    print(f"commit {result['commit']} · {s['reruns']} reruns in {s['wall_s']}s")
+    print(head)
+    for k in SUMMARY_KEYS:
+        line = f"{k:<16}{s.get(k, ''):>12}"
+        if baseline and isinstance(b.get(k), (int, float)) and b[k]:
+            line += f"{b[k]:>12}{(s[k] - b[k]) / b[k] * 100:>+9.1f}%"
+        print(line)
+    print()
+    print(f"{'action':<16}{'n':>6}{'p50_ms':>10}{'p95_ms':>10}{'p99_ms':>10}")
+    for action, p in result["by_action"].items():
+        if p["n"]:
+            print(f"{action:<16}{p['n']:>6}{p['p50_ms']:>10}{p['p95_ms']:>10}{p['p99_ms']:>10}")
+    for err in result["errors"]:
+        print("error:", err)
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--sessions", type=int, default=20, help="simulated sessions")
+    p.add_argument("--concurrency", type=int, default=8, help="sessions running at once")
+    p.add_argument("--actions", type=int, default=15, help="interactions per session")
+    p.add_argument("--latency", type=float, default=0.05, help="seconds added to each Yahoo call")
+    p.add_argument("--kalshi-latency", type=float, default=0.05, help="seconds added to each Kalshi call")
+    p.add_argument("--think", type=float, default=0.0, help="max random pause between actions (s)")
+    p.add_argument("--timeout", type=float, default=120.0, help="per-rerun timeout (s)")
+    p.add_argument("--rss-interval", type=float, default=0.5, help="RSS sampling period (s)")
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--out", type=Path, help="results file (default: loadtest_results/<commit>-<time>.json)")
+    p.add_argument("--compare", type=Path, help="earlier results file to diff against")
+    args = p.parse_args(argv)
+
+    result = run(args)
+    out = args.out or RESULTS_DIR / f"{result['commit']}-{datetime.now():%Y%m%d-%H%M%S}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(result, indent=2))
+    baseline = json.loads(args.compare.read_text()) if args.compare else None
+    print_report(result, baseline)
+    print(f"\nsaved {out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""Pre-rendered Market Dashboard for MarketLens.
+
+Writes a static HTML copy of the Market Dashboard (index prices, S&P chart,
+top volume, news) at startup and then every couple of minutes, and serves it
+over plain HTTP so passive viewers never open a Streamlit session:
+
+    python snapshot.py                          # serve on :8502, rewrite every 120 s
+    python snapshot.py --port 0                 # only write the file; serve it elsewhere
+    python snapshot.py --once                   # write one snapshot and exit (cron)
+    python snapshot.py --live-url https://markets.example.com/
+
+The page is a single self-contained file (SNAPSHOT_PATH, static/dashboard.html
+by default), so nginx, a CDN bucket or any other static server can serve it
+instead of the built-in one.
+
+The data layer and renderer come from app.py: everything above its APP HEADER
+section is executed here, outside Streamlit, and the UI below it is skipped.
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+from streamlit import logger as streamlit_logger
+
+APP_PATH   = Path(__file__).with_name("app.py")
+APP_MARKER = "# ── APP HEADER"
+
+def load_app():
+    """Namespace of app.py up to its UI: data functions, caches and write_snapshot."""
+    streamlit_logger.set_log_level("error")   # bare-mode st.* warnings
+    src = APP_PATH.read_text(encoding="utf-8")
+    ns = {"__name__": "marketlens_snapshot", "__file__": str(APP_PATH)}
+    exec(compile(src[:src.index(APP_MARKER)], str(APP_PATH), "exec"), ns)
+    return ns
+
+def write_loop(app, interval):
+    while True:
+        t = time.perf_counter()
+        try:
+            app["write_snapshot"]()
+            print(f"snapshot: wrote {app['SNAPSHOT_PATH']} in {time.perf_counter() - t:.1f}s", flush=True)
+        except Exception as e:
+            print(f"snapshot: {e!r}", file=sys.stderr, flush=True)
+        time.sleep(interval)
+
+class SnapshotHandler(SimpleHTTPRequestHandler):
+    """Static files from the snapshot directory, with / mapped to the page itself."""
+    page = "dashboard.html"
+
+    def do_GET(self):
+        if self.path in ("/", "/index.html"):
+            self.path = "/" + self.page
+        super().do_GET()
+
+    def end_headers(self):
+        self.send_header("Cache-Control", "no-cache")
+        super().end_headers()
+
+    def log_message(self, *args):
+        pass
+
+def main(argv=None):
+    p = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    p.add_argument("--port", type=int, default=8502, help="HTTP port for the built-in server; 0 to disable")
+    p.add_argument("--host", default="0.0.0.0")
+    p.add_argument("--interval", type=int, default=None, help="seconds between rewrites (default: SNAPSHOT_INTERVAL)")
+    p.add_argument("--live-url", default=None, help="where the page's \"Open live app\" link points")
+    p.add_argument("--once", action="store_true", help="write one snapshot and exit")
+    args = p.parse_args(argv)
+
+    if args.live_url:
+        os.environ["MARKETLENS_LIVE_URL"] = args.live_url
+    app = load_app()
+    interval = app["SNAPSHOT_INTERVAL"] = args.interval or app["SNAPSHOT_INTERVAL"]   # also the page's meta refresh
+
+    if args.once:
+        app["write_snapshot"]()
+        print(f"snapshot: wrote {app['SNAPSHOT_PATH']}")
+        return
+
+    threading.Thread(target=write_loop, args=(app, interval), name="snapshot", daemon=True).start()
+    if not args.port:
+        threading.Event().wait()
+    path = Path(app["SNAPSHOT_PATH"])
+    path.parent.mkdir(parents=True, exist_ok=True)
+    SnapshotHandler.page = path.name
+    server = ThreadingHTTPServer((args.host, args.port), partial(SnapshotHandler, directory=str(path.parent)))
+    print(f"snapshot: serving {path.parent} on http://{args.host}:{args.port}/", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()